@@ -0,0 +1,131 @@
+import os
+import json
+import asyncio
+
+import aiohttp
+
+# Async completion client: one pooled HTTP session, a global concurrency cap and per-request deadlines.
+OPENAI_API_KEY = os.getenv("OpenAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")  # Point at a local fake server for testing.
+AI_MODEL = os.getenv("AI_MODEL", "gpt-3.5-turbo-instruct")
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "16"))
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "60"))  # seconds per request
+
+
+class AIRequestError(Exception):
+    """Raised when a completion request fails or misses its deadline."""
+
+
+class Completion:
+    """Text and finish reason of a single completion."""
+    __slots__ = ("text", "finish_reason")
+
+    def __init__(self, text: str, finish_reason: str):
+        self.text = text
+        self.finish_reason = finish_reason
+
+
+class AIClient:
+    """Shares one connection pool and concurrency limit across every AI request in the bot."""
+    def __init__(self, api_key: str = OPENAI_API_KEY, base_url: str = OPENAI_BASE_URL,
+                 max_concurrency: int = AI_MAX_CONCURRENCY, max_connections: int = AI_MAX_CONNECTIONS):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._session = aiohttp.ClientSession(connector=connector, headers=headers)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def complete(self, prompt: str, max_tokens: int = 150, model: str = AI_MODEL,
+                       timeout: float = AI_TIMEOUT) -> Completion:
+        """Request a completion, waiting for a free slot but never past the deadline."""
+        session = self._get_session()
+        payload = {"model": model, "prompt": prompt, "max_tokens": max_tokens}
+        try:
+            data = await asyncio.wait_for(self._post(session, "/completions", payload), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise AIRequestError(f"AI request took longer than {timeout:g}s")
+        except (aiohttp.ClientError, ValueError) as e:
+            raise AIRequestError(str(e)) from e
+
+        try:
+            choice = data["choices"][0]
+        except (KeyError, IndexError, TypeError):
+            raise AIRequestError("Malformed completion response")
+        return Completion(choice.get("text", ""), choice.get("finish_reason"))
+
+    async def stream(self, prompt: str, max_tokens: int = 150, model: str = AI_MODEL, timeout: float = AI_TIMEOUT):
+        """Yield the completion in pieces as the API streams them; the last piece has the finish reason.
+
+        Like complete(), waiting for a free slot counts against the deadline.
+        """
+        session = self._get_session()
+        payload = {"model": model, "prompt": prompt, "max_tokens": max_tokens, "stream": True}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+            try:
+                async with session.post(f"{self.base_url}/completions", json=payload,
+                                        timeout=aiohttp.ClientTimeout(total=max(deadline - loop.time(), 0.001))) as response:
+                    if response.status != 200:
+                        data = await response.json(content_type=None)
+                        error = data.get("error", {}) if isinstance(data, dict) else {}
+                        raise AIRequestError(f"HTTP {response.status}: {error.get('message', 'request failed')}")
+                    # Server-sent events: "data: {json}" lines, ending with "data: [DONE]".
+                    async for line in response.content:
+                        if not line.startswith(b"data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == b"[DONE]":
+                            break
+                        choice = json.loads(data)["choices"][0]
+                        yield Completion(choice.get("text") or "", choice.get("finish_reason"))
+            finally:
+                self._semaphore.release()
+        except asyncio.TimeoutError:
+            raise AIRequestError(f"AI request took longer than {timeout:g}s")
+        except (aiohttp.ClientError, ValueError, KeyError, IndexError, TypeError) as e:
+            raise AIRequestError(str(e) or "Malformed completion stream") from e
+
+    async def embed(self, texts: list, model: str, timeout: float = AI_TIMEOUT) -> list:
+        """Embedding vectors for texts, in the same order."""
+        session = self._get_session()
+        try:
+            data = await asyncio.wait_for(self._post(session, "/embeddings", {"model": model, "input": texts}),
+                                          timeout=timeout)
+        except asyncio.TimeoutError:
+            raise AIRequestError(f"AI request took longer than {timeout:g}s")
+        except (aiohttp.ClientError, ValueError) as e:
+            raise AIRequestError(str(e)) from e
+
+        try:
+            return [item["embedding"] for item in sorted(data["data"], key=lambda item: item["index"])]
+        except (KeyError, TypeError):
+            raise AIRequestError("Malformed embeddings response")
+
+    async def _post(self, session: aiohttp.ClientSession, path: str, payload: dict) -> dict:
+        async with self._semaphore:
+            async with session.post(f"{self.base_url}{path}", json=payload) as response:
+                data = await response.json(content_type=None)
+                if response.status != 200:
+                    error = data.get("error", {}) if isinstance(data, dict) else {}
+                    raise AIRequestError(f"HTTP {response.status}: {error.get('message', 'request failed')}")
+                return data
+
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+ai_client = AIClient()
@@ -1,36 +1,115 @@
-import io
 import os
+import re
+import time
 import asyncio
-import openai
-import PyPDF2
+import hashlib
+from collections import Counter, OrderedDict
 import discord
+from ai_client import ai_client, AIRequestError, AI_MODEL
+from pdf_extraction import extract_text_async, extraction_version, format_page_range, parse_page_range, PdfExtractionError
+from pdf_cache import pdf_text_cache, text_key
+from pdf_download import PdfRejected, check_attachment, download_pdf
+from text_processing import count_tokens, split_into_chunks
+from jobs import Job, QueueFull, job_scheduler
+from metrics import ai_speculations, pdf_stage_seconds
+from message_stream import MessageStream
+from retrieval import build_prompt, index_cache, top_chunks
 
-# Set your OpenAI API key here or via environment variable
-openai.api_key = os.getenv("OpenAI_API_KEY")
+# Long documents are summarized map-reduce style: chunks in parallel, then one combining call.
+AI_CHUNK_TOKENS = int(os.getenv("AI_CHUNK_TOKENS", "2500"))
+AI_CHUNK_OVERLAP = int(os.getenv("AI_CHUNK_OVERLAP", "150"))
+AI_MAP_CONCURRENCY = int(os.getenv("AI_MAP_CONCURRENCY", "4"))  # chunk calls in flight per document
+AI_MAP_MAX_TOKENS = int(os.getenv("AI_MAP_MAX_TOKENS", "300"))
+AI_RESULT_MAX_TOKENS = int(os.getenv("AI_RESULT_MAX_TOKENS", "400"))
+AI_MAX_CONTINUATIONS = int(os.getenv("AI_MAX_CONTINUATIONS", "2"))
+AI_RESULT_CACHE_SIZE = int(os.getenv("AI_RESULT_CACHE_SIZE", "512"))  # results kept
+AI_RESULT_CACHE_TTL = float(os.getenv("AI_RESULT_CACHE_TTL", str(24 * 60 * 60)))  # seconds
+AI_STREAM = os.getenv("AI_STREAM", "1") == "1"  # stream the final completion into the DM as it is generated
+# While the user is choosing, start the option they are most likely to pick (if the queue is idle).
+AI_SPECULATE = os.getenv("AI_SPECULATE", "1") == "1"
+AI_SPECULATE_MAX = int(os.getenv("AI_SPECULATE_MAX", "4"))  # speculative computations in flight
+SPECULATE_CHARS_PER_TOKEN = 8  # generous upper bound, so the length check never rules out a one-chunk text
 
-async def process_pdf(attachment: discord.Attachment, message: discord.Message):
-    """Download the PDF, extract its text, and then prompt the user for AI processing."""
+ASK_MAX_TOKENS = int(os.getenv("ASK_MAX_TOKENS", "300"))
+DOCUMENT_REFS = 5000  # channels and messages remembered for -ask
+
+# "pages 3-10" (or "page 4", "pages 1-3, 7") in the upload message limits extraction to those pages.
+PAGES_PATTERN = re.compile(r"\bpages?\s*:?\s*(\d[\d\s,-]*)", re.IGNORECASE)
+
+# Bump whenever PROMPTS or the chunking pipeline changes so stale cached results are not served.
+PROMPT_VERSION = 1
+
+# option -> (prompt for the whole text, prompt for one chunk, prompt for combining chunk results)
+PROMPTS = {
+    "summary": (
+        "Please summarize the following text:\n\n{text}",
+        "Summarize this part of a longer document, keeping the key facts:\n\n{text}",
+        "Combine these partial summaries of one document into a single coherent summary:\n\n{text}",
+    ),
+    "flashcards": (
+        "Generate flashcards (in Q&A format) based on the following text:\n\n{text}",
+        "Generate flashcards (in Q&A format) based on this part of a longer document:\n\n{text}",
+        "Merge these flashcard sets into one list in Q&A format, dropping duplicates:\n\n{text}",
+    ),
+}
+
+def requested_pages(content: str):
+    """Page ranges asked for in a message, or None for the whole document. Raises PdfExtractionError if malformed."""
+    match = PAGES_PATTERN.search(content or "")
+    return parse_page_range(match.group(1).strip(" ,-")) if match else None
+
+async def process_pdf(attachment: discord.Attachment, message: discord.Message, job: Job, ranges: tuple = None):
+    """Download the PDF, extract its text (or the requested pages), and then prompt the user for AI processing."""
+    pages = format_page_range(ranges) if ranges else ""
+    cached = await pdf_text_cache.lookup_attachment(attachment.url, attachment.size, pages)
+    if cached is not None:
+        remember_document(cached[0], message, job)
+        await prompt_ai_options(message, cached[0], cached[1], job)
+        return
+
+    await job.set_status("📥 Downloading your PDF...")
     try:
-        pdf_bytes = await attachment.read()
-        pdf_file = io.BytesIO(pdf_bytes)
-        reader = PyPDF2.PdfReader(pdf_file)
+        with pdf_stage_seconds.time(stage="download"):
+            pdf = await download_pdf(attachment)
+    except PdfRejected as e:
+        await job.set_status(str(e))
+        return
     except Exception as e:
-        await message.channel.send("Error reading the PDF file.")
+        await job.set_status("Error reading the PDF file.")
+        return
+
+    key = text_key(pdf.digest, pages, extraction_version())
+    try:
+        text = await pdf_text_cache.get(key)
+        if text is None:
+            await job.set_status(f"📄 Extracting text from pages {pages}..." if pages else "📄 Extracting text...")
+            try:
+                with pdf_stage_seconds.time(stage="extract"):
+                    text = await extract_text_async(pdf.source(), ranges=ranges, name=attachment.filename)
+            except PdfExtractionError as e:
+                await job.set_status(f"Error reading the PDF file: {e}")
+                return
+    finally:
+        pdf.close()
+    if not text.strip():
+        await job.set_status("No text found on those pages." if pages else "No text found in this PDF.")
         return
+    await pdf_text_cache.put(key, text, url=attachment.url, size=attachment.size, pages=pages)
+    remember_document(key, message, job)
+
+    await prompt_ai_options(message, key, text, job)
 
-    text = ""
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text
+option_picks = Counter()  # option -> times users picked it, to guess what to speculate on
 
-    await prompt_ai_options(message, text)
+def likely_option() -> str:
+    """The option users pick most often (summary until there is data)."""
+    return max(PROMPTS, key=lambda option: option_picks[option])
 
 class OptionSelect(discord.ui.Select):
     """Dropdown menu for selecting between summary and flashcards."""
-    def __init__(self, user, pdf_text):
+    def __init__(self, user, digest):
         self.user = user
-        self.pdf_text = pdf_text
+        self.digest = digest
         options = [
             discord.SelectOption(label="Summary", value="summary", description="Generate a summary of the PDF"),
             discord.SelectOption(label="Flashcards", value="flashcards", description="Generate flashcards from the PDF")
@@ -43,62 +122,357 @@ class OptionSelect(discord.ui.Select):
             return
 
         option = self.values[0]
+        option_picks[option] += 1
         await interaction.response.defer()  # Acknowledge the interaction
-        await process_ai(self.pdf_text, option, interaction.message)
+        self.view.stop()
+        self.view.drop_speculation(keep=option)
+        guild_id = interaction.guild.id if interaction.guild else 0
+        job = Job(interaction.user.id, guild_id,
+                  lambda job: process_ai(self.digest, option, interaction.user, job), interaction.message, kind=option)
+        try:
+            ahead = job_scheduler.submit(job)
+        except QueueFull as e:
+            await interaction.followup.send(str(e), ephemeral=True)
+            return
+        await job.set_status(queued_status(ahead), view=None)
 
 class OptionView(discord.ui.View):
-    """View containing the dropdown menu."""
-    def __init__(self, user, pdf_text, timeout=60):
+    """View containing the dropdown menu; it refers to the text by its cache digest, not a copy."""
+    def __init__(self, user, digest, timeout=60):
         super().__init__(timeout=timeout)
-        self.add_item(OptionSelect(user, pdf_text))
+        self.speculation = None  # (option, result key) computing while the user decides
+        self.add_item(OptionSelect(user, digest))
+
+    async def speculate(self, text: str):
+        """Start the likely option's AI call now, unless real jobs are waiting or enough are running.
 
-async def prompt_ai_options(message: discord.Message, pdf_text: str):
+        Only single-chunk documents are speculated on: one call each, so AI_SPECULATE_MAX of them can
+        never hold every AI_MAX_CONCURRENCY slot the way a fanned-out long document could.
+        """
+        if not AI_SPECULATE or len(text) > AI_CHUNK_TOKENS * SPECULATE_CHARS_PER_TOKEN:
+            return  # far too long for one chunk; not worth tokenizing to find out
+        if await asyncio.to_thread(count_tokens, text) > AI_CHUNK_TOKENS:
+            return
+        if self.is_finished() or job_scheduler.queued or result_cache.speculating >= AI_SPECULATE_MAX:
+            return
+        option = likely_option()
+        key = result_key(text, option)
+        if result_cache.speculate(key, lambda: generate_result(text, option)):
+            self.speculation = (option, key)
+            ai_speculations.inc(outcome="started")
+
+    def drop_speculation(self, keep: str = None):
+        """Cancel the speculative call unless it is for the option being kept."""
+        if self.speculation is None:
+            return
+        option, key = self.speculation
+        self.speculation = None
+        if option == keep:
+            ai_speculations.inc(outcome="used")
+        elif result_cache.abandon(key):
+            ai_speculations.inc(outcome="cancelled")
+
+    async def on_timeout(self):
+        self.drop_speculation()
+
+async def prompt_ai_options(message: discord.Message, digest: str, pdf_text: str, job: Job):
     """Ask the user if they want a summary or flashcards generated from the PDF."""
     try:
-        view = OptionView(message.author, pdf_text)
-        await message.channel.send(
-            "Please Select what the bot should do with the PDF:",
-            view=view
-        )
+        view = OptionView(message.author, digest)
+        await job.status_message.edit(content="Please Select what the bot should do with the PDF:", view=view)
     except Exception as e:
         await message.channel.send("An error occurred while displaying the options.")
+        return
+    await view.speculate(pdf_text)
+
+def queued_status(ahead: int) -> str:
+    """Status line for a job that is waiting for a worker."""
+    if ahead == 0:
+        return "⏳ Starting..."
+    return f"⏳ Queued: you're #{ahead + 1} in line."
+
+class ResultCache:
+    """TTL + LRU cache of AI results that also collapses concurrent identical requests into one."""
+    def __init__(self, max_entries: int = AI_RESULT_CACHE_SIZE, ttl: float = AI_RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, result), least recently used first
+        self._in_flight = {}           # key -> task computing the result
+        self._waiters = {}             # key -> callers awaiting the in-flight task
+        self._speculative = set()      # in-flight keys started by speculate()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0                # requests that joined an in-flight computation
+
+    async def get_or_compute(self, key, compute):
+        """Return the cached result for key, or await compute() exactly once across concurrent callers."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        task = self._in_flight.get(key)
+        if task is not None and not task.cancelled():
+            self.shared += 1
+        else:
+            self.misses += 1
+            task = self._start(key, compute)
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # Shield so one caller giving up doesn't cancel the call the others are waiting on.
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def speculate(self, key, compute) -> bool:
+        """Start compute() in the background unless key is cached or already computing; returns whether it started."""
+        entry = self._entries.get(key)
+        if key in self._in_flight or (entry is not None and entry[0] > time.monotonic()):
+            return False
+        self._start(key, compute)
+        self._speculative.add(key)
+        return True
+
+    def abandon(self, key) -> bool:
+        """Cancel a speculative computation nobody is waiting for; returns whether it was cancelled."""
+        task = self._in_flight.get(key)
+        if key not in self._speculative or task is None or self._waiters.get(key):
+            return False
+        # Forget it now rather than when the cancellation lands, so a request in between starts afresh.
+        del self._in_flight[key]
+        self._speculative.discard(key)
+        task.cancel()
+        return True
+
+    @property
+    def speculating(self) -> int:
+        return len(self._speculative)
+
+    def _start(self, key, compute) -> asyncio.Task:
+        task = asyncio.ensure_future(compute())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+            self._speculative.discard(key)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, task.result())
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit/miss/shared counters and current size."""
+        return {"hits": self.hits, "misses": self.misses, "shared": self.shared,
+                "entries": len(self._entries), "in_flight": len(self._in_flight), "speculating": self.speculating}
+
+result_cache = ResultCache()
+
+def result_key(text: str, option: str) -> tuple:
+    """Cache key for one option's result on one text, under the current model and prompts."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest(), option, AI_MODEL, PROMPT_VERSION
+
+async def complete_with_continuation(prompt: str, max_tokens: int, on_text=None) -> str:
+    """Request a completion, asking the model to carry on while it stops at the token limit.
 
-async def process_ai(text: str, option: str, message: discord.Message):
-    """Use the OpenAI API to generate a summary or flashcards from the PDF text."""
-    if option == "summary":
-        prompt_text = f"Please summarize the following text:\n\n{text}"
-    elif option == "flashcards":
-        prompt_text = f"Generate flashcards (in Q&A format) based on the following text:\n\n{text}"
-    else:
-        await message.channel.send("Invalid option selected.")
+    With on_text, the completion is streamed and on_text is called with each piece as it arrives.
+    """
+    parts = []
+    for _ in range(AI_MAX_CONTINUATIONS + 1):
+        if on_text is None:
+            completion = await ai_client.complete(prompt + "".join(parts), max_tokens=max_tokens)
+            parts.append(completion.text)
+            finish_reason = completion.finish_reason
+        else:
+            finish_reason = None
+            async for piece in ai_client.stream(prompt + "".join(parts), max_tokens=max_tokens):
+                parts.append(piece.text)
+                on_text(piece.text)
+                finish_reason = piece.finish_reason or finish_reason
+        if finish_reason != "length":
+            break
+    return "".join(parts).strip()
+
+async def _map_chunks(chunks: list, template: str) -> list:
+    """Run template over every chunk concurrently, at most AI_MAP_CONCURRENCY at a time."""
+    semaphore = asyncio.Semaphore(AI_MAP_CONCURRENCY)
+
+    async def run(chunk):
+        async with semaphore:
+            completion = await ai_client.complete(template.format(text=chunk), max_tokens=AI_MAP_MAX_TOKENS)
+            return completion.text.strip()
+
+    return await asyncio.gather(*(run(chunk) for chunk in chunks))
+
+async def generate_result(text: str, option: str, on_text=None) -> str:
+    """Produce the summary or flashcards for a document of any length; on_text streams the final call."""
+    whole_prompt, chunk_prompt, combine_prompt = PROMPTS[option]
+    chunks = split_into_chunks(text, AI_CHUNK_TOKENS, AI_CHUNK_OVERLAP)
+    if len(chunks) <= 1:
+        return await complete_with_continuation(whole_prompt.format(text=text), AI_RESULT_MAX_TOKENS, on_text)
+
+    combined = "\n\n".join(await _map_chunks(chunks, chunk_prompt))
+    # Very long documents may need several combining rounds before the last call fits.
+    while count_tokens(combined) > AI_CHUNK_TOKENS:
+        combined = "\n\n".join(await _map_chunks(split_into_chunks(combined, AI_CHUNK_TOKENS), combine_prompt))
+    return await complete_with_continuation(combine_prompt.format(text=combined), AI_RESULT_MAX_TOKENS, on_text)
+
+async def process_ai(digest: str, option: str, user: discord.abc.User, job: Job):
+    """Use the OpenAI API to generate a summary or flashcards from the cached text of the PDF with this digest."""
+    if option not in PROMPTS:
+        await job.set_status("Invalid option selected.")
+        return
+    text = await pdf_text_cache.get(digest)
+    if text is None:
+        await job.set_status("This PDF is no longer cached. Please upload it again.")
         return
 
+    await job.set_status(f"🤖 Generating the {option}...")
+    key = result_key(text, option)
+    # Results too long for one message roll over into more messages, then into an attached file.
+    output = MessageStream(user, header=f"Here is the {option} for your PDF:\n\n", filename=f"{option}.txt")
+    # Only the request that starts the computation streams; cache hits and shared requests get the whole text.
+    on_text = output.feed if AI_STREAM else None
     try:
-        response = openai.Completion.create(
-            model="text-davinci-003",  # Modified: using model instead of engine
-            prompt=prompt_text,
-            max_tokens=150
-        )
-        result = response.choices[0].text.strip()
-    except Exception as e:
-        await message.channel.send("Error processing AI request.")
+        with pdf_stage_seconds.time(stage="ai"):
+            result = await result_cache.get_or_compute(key, lambda: generate_result(text, option, on_text))
+    except AIRequestError as e:
+        await output.abort("⚠️ The AI request failed part-way, so this is incomplete.")
+        await job.set_status("Error processing AI request.")
         return
 
+    await job.set_status("✉️ Sending it to your DMs...")
+    with pdf_stage_seconds.time(stage="dm"):
+        delivered = await output.finish(result)
+    if not delivered:
+        await job.set_status("Could not send you a DM. Please check your DM settings.")
+        return
+    await job.set_status(f"✅ Sent the {option} to your DMs.")
+
+channel_documents = OrderedDict()  # channel id -> text cache key of the last PDF uploaded there
+message_documents = OrderedDict()  # upload (or bot reply) message id -> text cache key
+
+def remember_document(key: str, message: discord.Message, job: Job):
+    """Make an uploaded PDF the channel's current document for -ask, and findable by replying to it."""
+    refs = [(channel_documents, message.channel.id), (message_documents, message.id)]
+    if job.status_message is not None:
+        refs.append((message_documents, job.status_message.id))
+    for documents, ref in refs:
+        documents[ref] = key
+        documents.move_to_end(ref)
+        if len(documents) > DOCUMENT_REFS:
+            documents.popitem(last=False)
+
+def document_for(message: discord.Message):
+    """The document a question is about: the PDF message it replies to, else the channel's latest PDF."""
+    if message.reference is not None and message.reference.message_id in message_documents:
+        return message_documents[message.reference.message_id]
+    return channel_documents.get(message.channel.id)
+
+async def submit_question(message: discord.Message, question: str):
+    """Queue an -ask question; the reply to it tracks progress and the answer is posted in the channel."""
+    key = document_for(message)
+    if key is None:
+        await message.reply("📄 Upload a PDF in this channel first (or reply to one) and then ask about it.",
+                            mention_author=False)
+        return
+    status_message = await message.reply("⏳ Queued...", mention_author=False)
+    guild_id = message.guild.id if message.guild else 0
+    job = Job(message.author.id, guild_id, lambda job: process_question(key, question, message.channel, job),
+              status_message, kind="question")
     try:
-        await message.author.send(f"Here is the {option} for your PDF:\n\n{result}")
-    except Exception:
-        await message.channel.send("Could not send you a DM. Please check your DM settings.")
+        ahead = job_scheduler.submit(job)
+    except QueueFull as e:
+        await job.set_status(str(e))
+        return
+    if ahead:
+        await job.set_status(queued_status(ahead))
 
-async def process_message(message: discord.Message):
-    """Checks if a message has a PDF attachment and processes it."""
-    if not message.attachments:
-        # No attachments in the message
+async def process_question(key: str, question: str, channel, job: Job):
+    """Answer a question from the chunks of the document that match it best, instead of the whole text."""
+    await job.set_status("🔎 Searching the PDF...")
+    try:
+        with pdf_stage_seconds.time(stage="retrieve"):
+            index = await index_cache.get(key, lambda: pdf_text_cache.get(key))
+            hits = await top_chunks(index, question) if index is not None else None
+    except (AIRequestError, PdfExtractionError):
+        await job.set_status("Error searching the PDF.")
+        return
+    if index is None:
+        await job.set_status("This PDF is no longer cached. Please upload it again.")
+        return
+    if not hits:
+        await job.set_status("🤷 I couldn't find anything about that in the PDF.")
         return
 
+    prompt = build_prompt(question, hits)
+    print(f"-ask: {count_tokens(prompt)} prompt tokens from {len(hits)} of {len(index.chunks)} chunks")
+    await job.set_status(f"🤖 Answering from {len(hits)} matching excerpts...")
+    output = MessageStream(channel, header=f"**Q:** {question}\n**A:** ", filename="answer.txt")
+    answer_key = (key, "ask", " ".join(question.lower().split()), AI_MODEL, PROMPT_VERSION)
+    on_text = output.feed if AI_STREAM else None
+    try:
+        with pdf_stage_seconds.time(stage="ai"):
+            answer = await result_cache.get_or_compute(
+                answer_key, lambda: complete_with_continuation(prompt, ASK_MAX_TOKENS, on_text))
+    except AIRequestError:
+        await output.abort("⚠️ The AI request failed part-way, so this answer is incomplete.")
+        await job.set_status("Error processing AI request.")
+        return
+    if not await output.finish(answer):
+        await job.set_status("Could not post the answer in this channel.")
+        return
+    await job.set_status(f"✅ Answered from {len(hits)} excerpts of the PDF.")
+
+_message_tasks = set()  # strong references so background PDF tasks aren't garbage collected
+
+def is_pdf_attachment(attachment: discord.Attachment) -> bool:
+    """Cheap metadata check for whether an attachment is meant to be a PDF."""
+    return attachment.filename.lower().endswith(".pdf") or attachment.content_type == "application/pdf"
+
+def dispatch_message(message: discord.Message):
+    """Fast path for on_message: start PDF handling in the background and return without any I/O."""
+    if message.author.bot or not message.attachments:
+        return
+    if not any(is_pdf_attachment(attachment) for attachment in message.attachments):
+        return
+    task = asyncio.create_task(process_message(message))
+    _message_tasks.add(task)
+    task.add_done_callback(_message_tasks.discard)
+
+async def process_message(message: discord.Message):
+    """Queues the first PDF attachment of a message for processing."""
     for attachment in message.attachments:
-        if attachment.filename.lower().endswith(".pdf"):
-            await process_pdf(attachment, message)
+        if is_pdf_attachment(attachment):
+            await submit_pdf(attachment, message)
             return
 
-    # If no PDF attachments are found
-    await message.channel.send("Please attach a PDF file for processing.")
\ No newline at end of file
+async def submit_pdf(attachment: discord.Attachment, message: discord.Message):
+    """Queue a PDF upload; the reply to the upload tracks the job's progress."""
+    try:
+        check_attachment(attachment)
+        ranges = requested_pages(message.content)
+    except PdfRejected as e:
+        await message.reply(str(e), mention_author=False)
+        return
+    except PdfExtractionError as e:
+        await message.reply(f"{e}. Use something like `pages 3-10` or `pages 1-3, 7`.", mention_author=False)
+        return
+    status_message = await message.reply("⏳ Queued...", mention_author=False)
+    guild_id = message.guild.id if message.guild else 0
+    job = Job(message.author.id, guild_id, lambda job: process_pdf(attachment, message, job, ranges), status_message)
+    try:
+        ahead = job_scheduler.submit(job)
+    except QueueFull as e:
+        await job.set_status(str(e))
+        return
+    if ahead:
+        await job.set_status(queued_status(ahead))
@@ -0,0 +1,85 @@
+import os
+import time
+import asyncio
+
+import discord
+
+# #general notices (create, join, leave, extend, delete) are gathered per guild and posted as one digest.
+ANNOUNCE_WINDOW = float(os.getenv("ANNOUNCE_WINDOW", "5"))           # seconds events are gathered
+ANNOUNCE_EDIT_WINDOW = float(os.getenv("ANNOUNCE_EDIT_WINDOW", "60"))  # seconds a digest keeps being extended
+MESSAGE_LIMIT = 2000
+
+
+class AnnouncementCoalescer:
+    """Batches announcements per guild and flushes them as a single message or an edit of the last digest."""
+    def __init__(self, window: float = ANNOUNCE_WINDOW, edit_window: float = ANNOUNCE_EDIT_WINDOW):
+        self.window = window
+        self.edit_window = edit_window
+        self._pending = {}   # guild_id -> (channel, [lines])
+        self._digests = {}   # guild_id -> (message, content, posted_at) of the latest digest
+        self._tasks = {}     # guild_id -> flush task
+        self.events = 0
+        self.requests = 0
+
+    def announce(self, channel: discord.TextChannel, line: str):
+        """Queue a line for the guild's general channel."""
+        guild_id = channel.guild.id
+        self.events += 1
+        _, lines = self._pending.get(guild_id, (None, []))
+        lines.append(line)
+        self._pending[guild_id] = (channel, lines)
+        if guild_id not in self._tasks:
+            self._tasks[guild_id] = asyncio.create_task(self._flush_later(guild_id))
+
+    async def _flush_later(self, guild_id: int):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._tasks.pop(guild_id, None)
+        channel, lines = self._pending.pop(guild_id, (None, []))
+        if lines:
+            await self.flush(guild_id, channel, lines)
+
+    async def flush(self, guild_id: int, channel: discord.TextChannel, lines: list):
+        """Post lines, appending to the recent digest message when they fit."""
+        digest = self._digests.get(guild_id)
+        if digest is not None:
+            message, content, posted_at = digest
+            combined = content + "\n" + "\n".join(lines)
+            if (message.channel.id == channel.id and time.monotonic() - posted_at < self.edit_window
+                    and len(combined) <= MESSAGE_LIMIT):
+                try:
+                    self.requests += 1
+                    await message.edit(content=combined)
+                    self._digests[guild_id] = (message, combined, posted_at)
+                    return
+                except discord.HTTPException:
+                    pass  # digest deleted or uneditable; post a fresh one
+
+        for content in _pack(lines):
+            try:
+                self.requests += 1
+                message = await channel.send(content)
+            except discord.HTTPException as e:
+                print(f"Could not post announcement in guild {guild_id}: {e}")
+                return
+            self._digests[guild_id] = (message, content, time.monotonic())
+
+
+def _pack(lines: list) -> list:
+    """Join lines into as few messages under the length limit as possible."""
+    messages = []
+    current = ""
+    for line in lines:
+        line = line[:MESSAGE_LIMIT]
+        if current and len(current) + 1 + len(line) > MESSAGE_LIMIT:
+            messages.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        messages.append(current)
+    return messages
+
+
+announcer = AnnouncementCoalescer()
@@ -0,0 +1,116 @@
+"""Compare the PDF extraction backends on a local corpus: speed, peak memory and text quality.
+
+Every installed backend (see pdf_extraction.BACKENDS) extracts every PDF in the corpus directory,
+each backend in a fresh process so its peak RSS is its own. Reported per backend:
+
+  pages/s       pages extracted per second of wall time, over the whole corpus
+  peak RSS MB   the process's peak resident set size after extracting everything
+  similarity    mean word-level similarity (difflib ratio, 0-1) to a reference text: <name>.txt
+                next to <name>.pdf when the corpus provides one, otherwise the --reference backend
+  words         total words extracted (a backend that drops text shows up here)
+
+Without --corpus, a synthetic corpus is generated with fake_services.make_pdf.
+
+Usage: python benchmarks/bench_extraction.py [--corpus DIR] [--reference pypdf2] [--repeat N] [--output FILE]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import difflib
+import argparse
+import resource
+import tempfile
+import subprocess
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pdf_extraction  # noqa: E402
+
+MAX_COMPARED_WORDS = 20000  # difflib is quadratic in the worst case; compare a prefix of long documents
+
+
+def build_corpus(directory: str) -> str:
+    from fake_services import make_pdf
+    for index, pages in enumerate((1, 5, 20, 50, 100)):
+        with open(os.path.join(directory, f"synthetic-{pages}p.pdf"), "wb") as f:
+            f.write(make_pdf(pages, words_per_page=400, seed=index))
+    return directory
+
+
+def page_count(data: bytes) -> int:
+    import PyPDF2
+    import io
+    return len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+
+
+def run_backend(backend: str, corpus: str, repeat: int) -> dict:
+    """Extract the corpus with one backend (called in a child process) and dump the texts for comparison."""
+    texts, pages, elapsed = {}, 0, 0.0
+    for path in sorted(glob.glob(os.path.join(corpus, "*.pdf"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        pages += page_count(data) * repeat
+        for _ in range(repeat):
+            started = time.perf_counter()
+            text = pdf_extraction.extract_text(data, pdf_extraction.PDF_MAX_PAGES, None, backend)
+            elapsed += time.perf_counter() - started
+        texts[os.path.basename(path)] = text
+    return {"backend": backend, "pages": pages, "seconds": elapsed,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "texts": texts}
+
+
+def similarity(text: str, reference: str) -> float:
+    words, reference_words = text.split()[:MAX_COMPARED_WORDS], reference.split()[:MAX_COMPARED_WORDS]
+    return difflib.SequenceMatcher(None, words, reference_words, autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="directory of sample PDFs (and optional <name>.txt ground truth)")
+    parser.add_argument("--reference", default="pypdf2", help="backend to compare against without ground truth")
+    parser.add_argument("--repeat", type=int, default=3, help="extractions per document")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    corpus = args.corpus or build_corpus(tempfile.mkdtemp(prefix="scholarsync-corpus-"))
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, corpus, args.repeat)))
+        return
+
+    results = {}
+    for backend in pdf_extraction.available_backends():
+        output = subprocess.run([sys.executable, __file__, "--corpus", corpus, "--repeat", str(args.repeat),
+                                 "--backend", backend], check=True, capture_output=True, text=True).stdout
+        results[backend] = json.loads(output)
+
+    reference = results.get(args.reference)
+    report = {"corpus": corpus, "documents": len(glob.glob(os.path.join(corpus, "*.pdf"))), "backends": {}}
+    print(f"{'backend':<10}{'pages/s':>10}{'peak RSS MB':>13}{'similarity':>12}{'words':>10}")
+    for backend, result in results.items():
+        scores = []
+        for name, text in result["texts"].items():
+            truth_path = os.path.join(corpus, name[:-4] + ".txt")
+            if os.path.exists(truth_path):
+                with open(truth_path, encoding="utf-8") as f:
+                    scores.append(similarity(text, f.read()))
+            elif reference is not None:
+                scores.append(similarity(text, reference["texts"][name]))
+        row = {"pages_per_s": round(result["pages"] / result["seconds"], 1) if result["seconds"] else None,
+               "peak_rss_mb": round(result["peak_rss_mb"], 1),
+               "similarity": round(statistics.mean(scores), 3) if scores else None,
+               "words": sum(len(text.split()) for text in result["texts"].values())}
+        report["backends"][backend] = row
+        print(f"{backend:<10}{row['pages_per_s']:>10}{row['peak_rss_mb']:>13}{str(row['similarity']):>12}{row['words']:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
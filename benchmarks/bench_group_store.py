@@ -0,0 +1,104 @@
+"""Measure what group persistence costs a command handler.
+
+Compares the write-behind GroupStore (what bot.py uses) with committing every mutation
+synchronously, over a join/leave/extend style workload.
+
+Usage: python benchmarks/bench_group_store.py [--groups N] [--mutations N]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import datetime
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("GROUP_DB_PATH", os.path.join(tempfile.gettempdir(), "bench_import.db"))
+
+from group_store import GroupStore  # noqa: E402
+from registry import Group  # noqa: E402
+
+
+def make_group(group_id: int) -> Group:
+    now = datetime.datetime.utcnow()
+    return Group(
+        guild_id=1, group_id=group_id, subject=f"subject-{group_id}", max_members=10, created_by="bench",
+        created_at=now, expire_at=now + datetime.timedelta(minutes=60), members=[group_id],
+        channel=group_id * 10, voice_channel=group_id * 10 + 1,
+    )
+
+
+def mutate(group: Group, step: int):
+    if step % 3 == 0:
+        group.members.add(-step)
+    elif step % 3 == 1 and len(group.members) > 1:
+        group.members.discard(min(group.members))
+    else:
+        group.expire_at += datetime.timedelta(minutes=1)
+
+
+def percentiles(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "p50_us": round(statistics.median(samples) * 1e6, 2),
+        "p99_us": round(samples[int(len(samples) * 0.99) - 1] * 1e6, 2),
+        "max_us": round(samples[-1] * 1e6, 2),
+    }
+
+
+async def bench_write_behind(path: str, groups: list, mutations: int) -> dict:
+    store = GroupStore(path, flush_interval=0.05)
+    samples = []
+    for step in range(mutations):
+        group = groups[step % len(groups)]
+        mutate(group, step)
+        started = time.perf_counter()
+        store.save_group(group)
+        samples.append(time.perf_counter() - started)
+        if step % 100 == 0:
+            await asyncio.sleep(0)  # let the flush task run, as it would between gateway events
+    while store._flush_task is not None and not store._flush_task.done():
+        await asyncio.sleep(0.01)
+    result = percentiles(samples)
+    result["flushes"] = store.flushes
+    store.close()
+    return result
+
+
+def bench_synchronous(path: str, groups: list, mutations: int) -> dict:
+    store = GroupStore(path)
+    samples = []
+    for step in range(mutations):
+        group = groups[step % len(groups)]
+        mutate(group, step)
+        started = time.perf_counter()
+        store.save_group(group)
+        store.flush()
+        samples.append(time.perf_counter() - started)
+    result = percentiles(samples)
+    result["flushes"] = store.flushes
+    store.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, default=1000)
+    parser.add_argument("--mutations", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        groups = [make_group(i) for i in range(1, args.groups + 1)]
+        write_behind = asyncio.run(bench_write_behind(os.path.join(tmp, "wb.db"), groups, args.mutations))
+        groups = [make_group(i) for i in range(1, args.groups + 1)]
+        synchronous = bench_synchronous(os.path.join(tmp, "sync.db"), groups, args.mutations)
+
+    print(f"{'mode':<14}{'p50 (us)':>10}{'p99 (us)':>10}{'max (us)':>10}{'flushes':>10}")
+    for name, result in (("write-behind", write_behind), ("synchronous", synchronous)):
+        print(f"{name:<14}{result['p50_us']:>10}{result['p99_us']:>10}{result['max_us']:>10}{result['flushes']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Offline load test: drive the real bot handlers against a fake Discord and a fake completion API.
+
+Scenarios:
+  groups  N users run -create, then some -join (through the real join view), -extend and -leave,
+          and finally every group's alert and expiry is fired through check_expiry.
+  pdf     M users upload a PDF at the same moment; each goes through ai_integration.process_message,
+          picks "summary" in the real option view and waits for the DM.
+
+Every phase reports throughput and p50/p99/max latency, the event loop's lag while the scenario
+ran, and how many Discord requests of each kind were made. The result is printed (or written with
+--output) as JSON, to keep as a baseline and compare between releases.
+
+Usage: python benchmarks/bench_load.py [--scenario groups|pdf|all] [--groups N] [--uploads N] [--output FILE]
+       [--env NAME=VALUE ...]   (e.g. --env JOB_WORKERS=8 to compare settings)
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import platform
+import argparse
+import tempfile
+import datetime
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_discord import FakeDiscord, FakeAttachment, FakeMessage, invoke  # noqa: E402
+from fake_services import FakeServices, make_pdf  # noqa: E402
+
+PROGRESS_PREFIXES = ("⏳", "📥", "📄", "🤖", "✉️", "Please Select")
+
+
+def summarize(samples: list, seconds: float, errors: int = 0) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0, "errors": errors}
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_per_s": round(len(samples) / seconds, 1) if seconds else None,
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p99_ms": round(samples[max(0, int(len(samples) * 0.99) - 1)] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+class LagMonitor:
+    """Measures how late a short periodic sleep wakes up, i.e. how long callbacks hold the loop."""
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def report(self) -> dict:
+        samples = sorted(self.samples) or [0.0]
+        return {"p50_ms": round(statistics.median(samples) * 1000, 2),
+                "p99_ms": round(samples[max(0, int(len(samples) * 0.99) - 1)] * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2)}
+
+
+async def timed(samples: list, errors: list, coro):
+    started = time.perf_counter()
+    try:
+        await coro
+    except Exception as e:
+        errors.append(repr(e))
+        return
+    samples.append(time.perf_counter() - started)
+
+
+async def run_phase(name: str, coros, concurrency: int, phases: dict):
+    """Run coroutines at most `concurrency` at a time and record their latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = [], []
+
+    async def bounded(coro):
+        async with semaphore:
+            await timed(samples, errors, coro)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(bounded(coro) for coro in coros))
+    phases[name] = summarize(samples, time.perf_counter() - started, len(errors))
+    if errors:
+        phases[name]["first_error"] = errors[0]
+    print(f"  {name}: {phases[name]}", file=sys.stderr)
+
+
+async def settle(user):
+    """Wait for the component callback the user's last command triggered (if any)."""
+    await asyncio.sleep(0)
+    if user.last_click is not None:
+        await user.last_click
+
+
+async def drain(bot):
+    """Let background work (announcement digests, teardown batches, the write-behind flush) finish."""
+    from announcements import announcer
+    from teardown import teardown_pipeline
+    from group_store import group_store
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        batch = teardown_pipeline._batch_task
+        busy = (announcer._tasks or teardown_pipeline._tasks or (batch is not None and not batch.done())
+                or (group_store._flush_task is not None and not group_store._flush_task.done()))
+        if not busy:
+            return
+        await asyncio.sleep(0.05)
+
+
+async def scenario_groups(bot, args) -> dict:
+    import bot as bot_module
+    fake = FakeDiscord(bot, latency=args.latency)
+    fake.install()
+    guild = fake.add_guild()
+    channel = guild.general
+    phases = {}
+
+    with LagMonitor() as lag:
+        creators = []
+        for i in range(args.groups):
+            user = guild.add_member(f"creator{i}")
+            user.answers.extend([f"Subject {i % 500}", "60", str(args.max_members)])
+            user.choices["SecretGroupSelect"] = "no"
+            creators.append(user)
+        await run_phase("create", (invoke(fake, bot_module.create_group, user, channel, "-create") for user in creators),
+                        args.concurrency, phases)
+
+        def pick_open_group(select):
+            values = [option.value for option in select.options if option.value != "none"]
+            return random.choice(values) if values else "none"
+
+        async def join(user):
+            await invoke(fake, bot_module.join_group, user, channel, "-join")
+            await settle(user)
+
+        joiners = []
+        for i in range(args.groups // 2):
+            user = guild.add_member(f"joiner{i}")
+            user.choices["GroupSelect"] = pick_open_group
+            joiners.append(user)
+        await run_phase("join", (join(user) for user in joiners), args.concurrency, phases)
+
+        extenders = creators[: args.groups // 4]
+        for user in extenders:
+            user.answers.append("30")
+        await run_phase("extend", (invoke(fake, bot_module.extend_group, user, channel, "-extend") for user in extenders),
+                        args.concurrency, phases)
+
+        await run_phase("leave", (invoke(fake, bot_module.leave_group, user, channel, "-leave") for user in joiners),
+                        args.concurrency, phases)
+
+        groups = list(bot_module.registry.groups(guild.id))
+        for group in groups:
+            # Make the 10-minute alert due now.
+            group.expire_at = datetime.datetime.utcnow() + datetime.timedelta(minutes=9)
+        await run_phase("alert", (bot_module.check_expiry(group.guild_id, group.group_id, "alert_10") for group in groups),
+                        args.concurrency, phases)
+        await run_phase("expire", (bot_module.check_expiry(group.guild_id, group.group_id, "expire") for group in groups),
+                        args.concurrency, phases)
+        await drain(bot)
+
+    return {"phases": phases, "loop_lag": lag.report(), "discord_requests": dict(fake.requests),
+            "groups_left": bot_module.registry.count(guild.id)}
+
+
+async def scenario_pdf(bot, args, services: FakeServices) -> dict:
+    from ai_integration import process_message
+    fake = FakeDiscord(bot, latency=args.latency)
+    fake.install()
+    guild = fake.add_guild()
+    channel = guild.general
+    loop = asyncio.get_running_loop()
+    outcomes = {}
+
+    async def upload(i: int):
+        user = guild.add_member(f"uploader{i}")
+        user.choices["OptionSelect"] = "summary"
+        done = loop.create_future()
+
+        def finish(outcome: str):
+            if not done.done():
+                done.set_result(outcome)
+
+        user.on_dm = lambda content: finish("dm")
+        user.on_status = lambda content: None if content.startswith(PROGRESS_PREFIXES) else finish(content[:60])
+        data = make_pdf(args.pages, seed=i)
+        url = services.add_pdf(f"doc{i}.pdf", data)
+        # Handed straight to process_message (what on_message's dispatch_message schedules).
+        message = FakeMessage(fake, channel, user, "", attachments=[FakeAttachment(url, f"doc{i}.pdf", len(data))])
+        await process_message(message)
+        outcome = await asyncio.wait_for(done, timeout=args.timeout)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if outcome != "dm":
+            raise RuntimeError(outcome)
+
+    phases = {}
+    with LagMonitor() as lag:
+        await run_phase("upload_to_dm", (upload(i) for i in range(args.uploads)), args.uploads, phases)
+        await drain(bot)
+    return {"phases": phases, "outcomes": outcomes, "loop_lag": lag.report(), "discord_requests": dict(fake.requests),
+            "completion_requests": services.completions, "downloads": services.downloads}
+
+
+async def main_async(args) -> dict:
+    services = FakeServices(ai_latency=args.ai_latency)
+    await services.start()
+    import bot as bot_module
+    from ai_client import ai_client
+    ai_client.base_url = f"{services.base_url}/v1"
+
+    results = {"meta": {"started": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                        "python": platform.python_version(), "platform": platform.platform(),
+                        "args": vars(args)},
+               "scenarios": {}}
+    try:
+        if args.scenario in ("groups", "all"):
+            print("groups:", file=sys.stderr)
+            results["scenarios"]["groups"] = await scenario_groups(bot_module.bot, args)
+        if args.scenario in ("pdf", "all"):
+            print("pdf:", file=sys.stderr)
+            results["scenarios"]["pdf"] = await scenario_pdf(bot_module.bot, args, services)
+    finally:
+        await ai_client.close()
+        import pdf_download
+        if pdf_download._session is not None:
+            await pdf_download._session.close()
+        await services.stop()
+        from pdf_extraction import shutdown_pool
+        shutdown_pool()
+        bot_module.group_store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=("groups", "pdf", "all"), default="all")
+    parser.add_argument("--groups", type=int, default=10000)
+    parser.add_argument("--max-members", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=200, help="commands in flight at once (groups scenario)")
+    parser.add_argument("--uploads", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per fake Discord request")
+    parser.add_argument("--ai-latency", type=float, default=0.2, help="seconds per fake completion")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds an upload may take")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="bot setting to override")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="scholarsync-bench-")
+    os.environ["GROUP_DB_PATH"] = os.path.join(workdir, "groups.db")
+    os.environ["PDF_CACHE_DIR"] = os.path.join(workdir, "pdf-cache")
+    for setting in args.env:
+        name, _, value = setting.partition("=")
+        os.environ[name] = value
+
+    results = asyncio.run(main_async(args))
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measure the resident memory a large guild's member cache costs under each intents policy.
+
+Builds a guild with N members through discord.py's own Guild/Member parsing, once with
+Intents.all() (what bot.py used to run with: every member cached after chunking) and once with
+the reduced intents and member-cache flags bot.py uses now. Each mode runs in a fresh process
+and reports the growth of its resident set size.
+
+The same member payloads are fed to both modes, so this isolates the cache policy. In production
+the reduced intents also mean Discord never sends the member list (no GUILD_MEMBERS intent, no
+chunking), so the payloads themselves are never received either.
+
+Usage: python benchmarks/bench_member_cache.py [--members N]
+"""
+import gc
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import discord
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def member_payload(user_id: int) -> dict:
+    return {
+        "user": {"id": str(user_id), "username": f"student{user_id}", "discriminator": "0",
+                 "global_name": f"Student {user_id}", "avatar": None},
+        "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0,
+    }
+
+
+def guild_payload(members: int) -> dict:
+    return {
+        "id": "1", "name": "bench", "owner_id": "2", "member_count": members, "large": True,
+        "roles": [{"id": "1", "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [], "emojis": [], "stickers": [], "features": [], "voice_states": [],
+        # A generator, so payloads are parsed one at a time and only what the cache keeps is measured.
+        "members": (member_payload(10_000 + i) for i in range(members)),
+    }
+
+
+def measure(mode: str, members: int) -> dict:
+    if mode == "all":
+        intents = discord.Intents.all()
+    else:
+        intents = discord.Intents.default()
+        intents.message_content = True
+        intents.typing = False
+    client = discord.Client(intents=intents, member_cache_flags=discord.MemberCacheFlags.from_intents(intents))
+    gc.collect()
+    before = rss_bytes()
+    guild = discord.Guild(data=guild_payload(members), state=client._connection)
+    gc.collect()
+    return {"mode": mode, "members": members, "cached_members": len(guild.members),
+            "rss_growth_mb": round((rss_bytes() - before) / 2**20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=50_000)
+    parser.add_argument("--mode", choices=("all", "reduced"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.members)))
+        return
+
+    print(f"{'intents':<10}{'members':>10}{'cached':>10}{'RSS growth (MB)':>18}")
+    for mode in ("all", "reduced"):
+        output = subprocess.run([sys.executable, __file__, "--members", str(args.members), "--mode", mode],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output)
+        print(f"{mode:<10}{result['members']:>10}{result['cached_members']:>10}{result['rss_growth_mb']:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""In-process stand-in for the parts of Discord the bot talks to.
+
+Guilds, channels, members and messages implement just the attributes and coroutines bot.py and
+ai_integration.py use. Every REST call sleeps for a configurable round trip and is counted per route,
+and user replies are delivered through the bot's real dispatch("message") path, so pending
+wait_for listeners are checked exactly as they would be for gateway events.
+
+Simulated users answer prompts and click components on their own: see FakeUser.
+"""
+import asyncio
+import itertools
+from collections import Counter, deque
+
+from discord.ext import commands
+
+_ids = itertools.count(10**15)
+
+
+def new_id() -> int:
+    return next(_ids)
+
+
+class FakeDiscord:
+    """Routes, latency and bookkeeping shared by every fake object."""
+    def __init__(self, bot, latency: float = 0.005):
+        self.bot = bot
+        self.latency = latency
+        self.requests = Counter()  # route -> count
+        self.channels = {}
+        self.guilds = {}
+        self.user = FakeUser(self, "ScholarSync", bot=True)
+        self._tasks = set()
+
+    def install(self):
+        """Point the bot's cache lookups at this fake (call from inside the running event loop)."""
+        self.bot.loop = self.bot._connection.loop = asyncio.get_running_loop()
+        self.bot.get_channel = self.channels.get
+        self.bot.get_guild = self.guilds.get
+        self.bot._connection.user = self.user
+
+    async def request(self, route: str):
+        self.requests[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def add_guild(self, name: str = "bench") -> "FakeGuild":
+        guild = FakeGuild(self, name)
+        self.guilds[guild.id] = guild
+        return guild
+
+    def click_for(self, view, message: "FakeMessage"):
+        """Have the user a message is aimed at use its components, once the sender has the message in hand."""
+        asyncio.get_running_loop().call_soon(self._click, view, message)
+
+    def _click(self, view, message: "FakeMessage"):
+        user = message.reference_author
+        if user is None:
+            return
+        for item in view.children:
+            choice = user.choices.get(type(item).__name__)
+            values = choice(item) if callable(choice) else choice
+            if values is None:
+                continue
+            values = values if isinstance(values, list) else [values]
+            item._values = values
+            user.last_click = self.spawn(item.callback(FakeInteraction(self, user, message, data={"values": values})))
+            return
+
+    def user_says(self, user: "FakeUser", channel: "FakeTextChannel", content: str, attachments=()):
+        """Deliver a message as the gateway would: to wait_for listeners and on_message."""
+        message = FakeMessage(self, channel, user, content, attachments=list(attachments))
+        self.bot.dispatch("message", message)
+        return message
+
+
+class FakeRole:
+    def __init__(self, guild):
+        self.id = guild.id
+        self.name = "@everyone"
+
+
+class FakeGuild:
+    def __init__(self, fake: FakeDiscord, name: str):
+        self.fake = fake
+        self.id = new_id()
+        self.name = name
+        self.default_role = FakeRole(self)
+        self.categories = []
+        self.text_channels = []
+        self.voice_channels = []
+        self.members = {}
+        self.general = self._add_channel(FakeTextChannel, "general", None)
+
+    def _add_channel(self, cls, name, category):
+        channel = cls(self.fake, self, name, category)
+        self.fake.channels[channel.id] = channel
+        (self.voice_channels if cls is FakeVoiceChannel else self.text_channels).append(channel)
+        if category is not None:
+            category.channels.append(channel)
+        return channel
+
+    def add_member(self, name: str) -> "FakeUser":
+        member = FakeUser(self.fake, name, guild=self)
+        self.members[member.id] = member
+        return member
+
+    def get_member(self, user_id: int):
+        return None  # the bot runs without a member cache
+
+    async def query_members(self, user_ids=None, cache=False, **kwargs):
+        await self.fake.request("GATEWAY request_guild_members")
+        return [self.members[user_id] for user_id in user_ids or () if user_id in self.members]
+
+    async def create_category(self, name: str, **kwargs):
+        await self.fake.request("POST /guilds/channels")
+        category = FakeCategory(self, name)
+        self.categories.append(category)
+        return category
+
+    async def create_text_channel(self, name: str, category=None, overwrites=None, **kwargs):
+        await self.fake.request("POST /guilds/channels")
+        return self._add_channel(FakeTextChannel, name, category)
+
+    async def create_voice_channel(self, name: str, category=None, overwrites=None, **kwargs):
+        await self.fake.request("POST /guilds/channels")
+        return self._add_channel(FakeVoiceChannel, name, category)
+
+    def _remove_channel(self, channel):
+        self.fake.channels.pop(channel.id, None)
+        for channels in (self.text_channels, self.voice_channels):
+            if channel in channels:
+                channels.remove(channel)
+        if channel.category is not None and channel in channel.category.channels:
+            channel.category.channels.remove(channel)
+
+
+class FakeCategory:
+    def __init__(self, guild: FakeGuild, name: str):
+        self.id = new_id()
+        self.guild = guild
+        self.name = name
+        self.channels = []
+
+
+class FakeGuildChannel:
+    def __init__(self, fake: FakeDiscord, guild: FakeGuild, name: str, category):
+        self.fake = fake
+        self.id = new_id()
+        self.guild = guild
+        self.name = name
+        self.category = category
+        self.mention = f"<#{self.id}>"
+
+    async def set_permissions(self, target, **kwargs):
+        await self.fake.request("PUT /channels/permissions")
+
+    async def delete(self, **kwargs):
+        await self.fake.request("DELETE /channels")
+        self.guild._remove_channel(self)
+
+    async def create_invite(self, **kwargs):
+        await self.fake.request("POST /channels/invites")
+        return FakeInvite(f"https://discord.gg/{self.id:x}")
+
+
+class FakeTextChannel(FakeGuildChannel):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.messages = deque(maxlen=50)
+
+    async def send(self, content: str = None, **kwargs):
+        await self.fake.request("POST /channels/messages")
+        message = FakeMessage(self.fake, self, self.fake.user, content, view=kwargs.get("view"))
+        self.messages.append(message)
+        return message
+
+
+class FakeVoiceChannel(FakeGuildChannel):
+    pass
+
+
+class FakeDMChannel:
+    def __init__(self, user):
+        self.id = new_id()
+        self.guild = None
+        self.recipient = user
+
+
+class FakeInvite:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeUser:
+    """A guild member (or the bot itself). It answers prompts and clicks components by itself:
+
+    - `answers` holds replies to text prompts; one is posted after each plain message the bot
+      sends to this user's command context.
+    - `choices` maps a component class name (e.g. "GroupSelect") to the value to pick, or to a function
+      of the component returning it (None skips the component).
+    - `on_dm` is called with the content of every DM, `on_status` with the new content whenever a
+      bot message aimed at this user is edited.
+    - `last_click` is the task running the most recent component callback.
+    """
+    def __init__(self, fake: FakeDiscord, name: str, guild: FakeGuild = None, bot: bool = False):
+        self.fake = fake
+        self.id = new_id()
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.guild = guild
+        self.mention = f"<@{self.id}>"
+        self.answers = deque()
+        self.choices = {}
+        self.on_dm = None
+        self.on_status = None
+        self.last_click = None
+        self.dm_channel = FakeDMChannel(self)
+
+    def __eq__(self, other):
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    async def send(self, content: str = None, **kwargs):
+        await self.fake.request("POST /channels/messages (DM)")
+        if self.on_dm is not None:
+            self.on_dm(content)
+        return FakeMessage(self.fake, self.dm_channel, self.fake.user, content)
+
+
+class FakeAttachment:
+    def __init__(self, url: str, filename: str, size: int, content_type: str = "application/pdf"):
+        self.id = new_id()
+        self.url = url
+        self.filename = filename
+        self.size = size
+        self.content_type = content_type
+
+
+class FakeMessage:
+    def __init__(self, fake: FakeDiscord, channel, author: FakeUser, content: str, attachments=None, view=None):
+        self.fake = fake
+        self.id = new_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content or ""
+        self.attachments = attachments or []
+        self.view = view
+        self.reference_author = None  # the user a bot message is aimed at; they are the one who clicks
+        if view is not None:
+            fake.click_for(view, self)
+
+    async def edit(self, content=None, view=None, **kwargs):
+        await self.fake.request("PATCH /channels/messages")
+        if content is not None:
+            self.content = content
+        self.view = view
+        if self.reference_author is not None and self.reference_author.on_status is not None:
+            self.reference_author.on_status(self.content)
+        if view is not None:
+            self.fake.click_for(view, self)
+        return self
+
+    async def delete(self, **kwargs):
+        await self.fake.request("DELETE /channels/messages")
+
+    async def reply(self, content: str = None, **kwargs):
+        reply = await self.channel.send(content, **kwargs)
+        reply.reference_author = self.author
+        return reply
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        await self.interaction.fake.request("POST /interactions/callback")
+
+    async def defer(self, **kwargs):
+        self.done = True
+        await self.interaction.fake.request("POST /interactions/callback")
+
+    async def edit_message(self, **kwargs):
+        self.done = True
+        await self.interaction.fake.request("POST /interactions/callback")
+
+    async def send_modal(self, modal):
+        self.done = True
+        await self.interaction.fake.request("POST /interactions/callback")
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        await self.interaction.fake.request("POST /webhooks (followup)")
+        message = FakeMessage(self.interaction.fake, self.interaction.channel, self.interaction.fake.user, content,
+                              view=kwargs.get("view"))
+        message.reference_author = self.interaction.user
+        return message
+
+
+class FakeInteraction:
+    def __init__(self, fake: FakeDiscord, user: FakeUser, message: FakeMessage, data: dict = None):
+        self.fake = fake
+        self.user = user
+        self.message = message
+        self.channel = message.channel
+        self.guild = message.guild
+        self.guild_id = message.guild.id if message.guild else None
+        self.data = data or {}
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+
+class FakeContext:
+    """Enough of commands.Context for the prefix commands: the invoking user's replies come from author.answers."""
+    def __init__(self, fake: FakeDiscord, author: FakeUser, channel: FakeTextChannel, content: str):
+        self.fake = fake
+        self.bot = fake.bot
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.message = FakeMessage(fake, channel, author, content)
+
+    async def send(self, content: str = None, **kwargs):
+        message = await self.channel.send(content, **kwargs)
+        message.reference_author = self.author
+        if kwargs.get("view") is None and self.author.answers:
+            # The user reads the prompt and replies; wait_for is registered before the loop runs this.
+            answer = self.author.answers.popleft()
+            asyncio.get_running_loop().call_soon(self.fake.user_says, self.author, self.channel, answer)
+        return message
+
+
+def invoke(fake: FakeDiscord, command: commands.Command, author: FakeUser, channel: FakeTextChannel, content: str):
+    """Run a prefix command's handler as if author had typed content in channel."""
+    return command.callback(FakeContext(fake, author, channel, content))
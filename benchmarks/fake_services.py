@@ -0,0 +1,107 @@
+"""Local HTTP stand-ins for the completion API and Discord's attachment CDN.
+
+Both run on one aiohttp server: POST /v1/completions answers after a configurable delay (spread over
+one server-sent event per word when the request asks for a stream), and GET /attachments/<name>
+serves PDFs registered with add_pdf.
+"""
+import json
+import asyncio
+
+from aiohttp import web
+
+WORDS = ("study", "group", "exam", "lecture", "notes", "theorem", "proof", "chapter", "revision", "summary",
+         "concept", "example", "definition", "problem", "solution", "review", "question", "answer")
+
+
+def make_pdf(pages: int, words_per_page: int = 300, seed: int = 0) -> bytes:
+    """A valid PDF with real text on every page (so extraction does real work)."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for page in range(pages):
+        page_id, content_id = 4 + 2 * page, 5 + 2 * page
+        kids.append(f"{page_id} 0 R")
+        lines = [f"(document {seed} page {page + 1}) Tj T*"]
+        for line in range(0, words_per_page, 12):
+            words = " ".join(WORDS[(seed + page * 7 + line + i) % len(WORDS)] for i in range(12))
+            lines.append(f"({words}) Tj T*")
+        stream = ("BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(lines) + " ET").encode()
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[object_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class FakeServices:
+    def __init__(self, ai_latency: float = 0.2, ai_words: int = 120):
+        self.ai_latency = ai_latency
+        self.ai_words = ai_words
+        self.pdfs = {}
+        self.completions = 0
+        self.downloads = 0
+        self._runner = None
+        self.base_url = None
+
+    def add_pdf(self, name: str, data: bytes) -> str:
+        self.pdfs[name] = data
+        return f"{self.base_url}/attachments/{name}"
+
+    async def _complete(self, request: web.Request):
+        body = await request.json()
+        self.completions += 1
+        words = [WORDS[i % len(WORDS)] for i in range(min(self.ai_words, body.get("max_tokens", 150)))]
+        if not body.get("stream"):
+            await asyncio.sleep(self.ai_latency)
+            return web.json_response({"choices": [{"text": " " + " ".join(words), "finish_reason": "stop"}]})
+
+        # Streamed: the same total time, spread over one server-sent event per word.
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.ai_latency / len(words))
+            finish_reason = "stop" if i == len(words) - 1 else None
+            event = json.dumps({"choices": [{"text": " " + word, "finish_reason": finish_reason}]})
+            await response.write(f"data: {event}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def _attachment(self, request: web.Request):
+        data = self.pdfs.get(request.match_info["name"])
+        if data is None:
+            raise web.HTTPNotFound()
+        byte_range = request.http_range
+        if byte_range.start is not None or byte_range.stop is not None:
+            # Like the CDN: partial content for Range requests (the bot reads a PDF's ends for its page count).
+            start, stop, _ = byte_range.indices(len(data))
+            return web.Response(body=data[start:stop], status=206, content_type="application/pdf",
+                                headers={"Content-Range": f"bytes {start}-{stop - 1}/{len(data)}"})
+        self.downloads += 1
+        return web.Response(body=data, content_type="application/pdf")
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/v1/completions", self._complete)
+        app.router.add_get("/attachments/{name}", self._attachment)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
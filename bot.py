@@ -4,29 +4,80 @@ print("Jai RadhaKrishna")
 # pip install -r requirements.txt
 
 import discord
-from discord.ext import commands, tasks
-from discord.ui import Select, View, Button
+from discord import app_commands
+from discord.ext import commands
+from discord.ui import Select, UserSelect, View, Button
+import io
 import datetime
+from abc import ABC, abstractmethod
 import asyncio
+import time
 import os
+import traceback
 from keep_alive import keep_alive
-from ai_integration import process_message
+from pdf_extraction import shutdown_pool
+from pdf_download import close_session as close_download_session
+from ai_client import ai_client
+from ai_integration import dispatch_message, submit_question, result_cache
+from pdf_cache import pdf_text_cache
+from group_store import group_store
+from registry import Group, GroupRegistry
+from expiry import ExpiryScheduler
+from teardown import teardown_pipeline, send_step, delete_step
+from announcements import announcer
+from jobs import job_scheduler
+import metrics
+import profiling
 
-bot = commands.Bot(command_prefix='-', help_command=None, intents=discord.Intents.all())
+def parse_shard_ids(value: str):
+    """Parse SHARD_IDS such as "0,1,2" or "0-3" into a list of shard IDs (None when unset)."""
+    if not value:
+        return None
+    shard_ids = []
+    for part in value.split(","):
+        if "-" in part:
+            first, last = part.split("-", 1)
+            shard_ids.extend(range(int(first), int(last) + 1))
+        else:
+            shard_ids.append(int(part))
+    return shard_ids
+
+# SHARD_COUNT/SHARD_IDS let several processes split the guilds between them; unset means one process, auto shard count.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS"))
+# On startup, delete the leftover voice channel of a stored group whose text channel is gone. Off by default.
+RECONCILE_DELETE_ORPHANS = os.getenv("RECONCILE_DELETE_ORPHANS", "0") == "1"
 
-# Global storage for study groups.
-# Each group dictionary includes:
-# group_id, subject, max_members, created_by, created_at, expire_at,
-# members (list of user ids), channel (text channel id), voice_channel (voice channel id),
+# Only the intents the bot uses: guilds/channels, messages (prefix commands and PDF uploads) and voice states.
+# The member list isn't requested or cached: the invite picker is Discord's native user select, and the
+# few members the bot needs are looked up on demand (see resolve_members).
+intents = discord.Intents.default()
+intents.message_content = True
+intents.typing = False
+
+bot = commands.AutoShardedBot(command_prefix='-', help_command=None, intents=intents,
+                              member_cache_flags=discord.MemberCacheFlags.from_intents(intents),
+                              chunk_guilds_at_startup=False, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+
+# Global storage for study groups, loaded from (and written behind to) the SQLite group store.
+# The registry partitions groups by guild and keeps indexes (public/secret, open seats, subject prefix,
+# user -> group) up to date, so listings never scan every group. Each Group record holds:
+# guild_id, group_id, subject, max_members, created_by, created_at, expire_at,
+# members (set of user ids), channel (text channel id), voice_channel (voice channel id),
 # alert flags, and secret flag.
-study_groups = {}
-group_counter = 1  # To assign unique group IDs
-user_groups = {}   # Mapping user_id -> group_id (to allow one group per user)
+registry = group_store.load(GroupRegistry())
+reconciled = False  # on_ready can fire again after reconnects; reconcile only once
+
+def next_group_id(guild_id: int) -> int:
+    """Hands out the next group ID in a guild."""
+    group_id = registry.next_group_id(guild_id)
+    group_store.set_counter(guild_id, registry.next_id_of(guild_id))
+    return group_id
 
 # ----------------- New Classes for Secret Group & Invite Handling -----------------
 @bot.event
 async def on_message(message: discord.Message):
-    await process_message(message)
+    dispatch_message(message)  # PDF work runs as its own task so commands are never delayed
     await bot.process_commands(message)
     
 class SecretGroupSelect(Select):
@@ -48,25 +99,37 @@ class SecretGroupSelect(Select):
             self.secret_future.set_result(interaction.data["values"][0].lower())
         await interaction.response.send_message("Secret group selection recorded.", ephemeral=True)
 
-class InviteSelect(Select):
-    """Multi-select menu to choose server members to invite (or choose External Invite)."""
-    def __init__(self, creator, guild):
+class InviteSelect(UserSelect):
+    """Native member picker: Discord searches the guild's members itself, so the bot needs no member list."""
+    def __init__(self, creator):
+        super().__init__(placeholder="Search members to invite", min_values=0, max_values=25)
         self.creator = creator
-        self.selected_values = []
-        options = []
-        for member in guild.members:
-            if not member.bot and member != creator:
-                options.append(discord.SelectOption(label=member.display_name, value=str(member.id)))
-        options.append(discord.SelectOption(label="External Invite", value="external"))
-        super().__init__(placeholder="Select members to invite", min_values=0, max_values=len(options), options=options)
+        self.selected_members = []
 
     async def callback(self, interaction: discord.Interaction):
         if interaction.user != self.creator:
             await interaction.response.send_message("This Selectin is **NOT** for You.", ephemeral=True)
             return
-        self.selected_values = self.values
+        # Selected users arrive resolved in the interaction; anyone who isn't in the guild comes back as a User.
+        self.selected_members = [user for user in self.values
+                                 if isinstance(user, discord.Member) and not user.bot and user != self.creator]
         await interaction.response.send_message("Please Click Confirm Again!😅", ephemeral=True)
 
+class ExternalInviteButton(Button):
+    """Toggles whether an external invite link is sent to the creator."""
+    def __init__(self, creator):
+        super().__init__(label="External Invite: Off", style=discord.ButtonStyle.secondary)
+        self.creator = creator
+
+    async def callback(self, interaction: discord.Interaction):
+        if interaction.user != self.creator:
+            await interaction.response.send_message("This button is not for you.", ephemeral=True)
+            return
+        self.view.external = not self.view.external
+        self.label = f"External Invite: {'On' if self.view.external else 'Off'}"
+        self.style = discord.ButtonStyle.primary if self.view.external else discord.ButtonStyle.secondary
+        await interaction.response.edit_message(view=self.view)
+
 class ConfirmInviteButton(Button):
     """Button to confirm the invite selection."""
     def __init__(self, creator):
@@ -81,12 +144,14 @@ class ConfirmInviteButton(Button):
         self.view.stop()
 
 class InviteView(View):
-    """View that contains the InviteSelect and a Confirm button."""
-    def __init__(self, creator, guild, timeout=20):
+    """View that contains the InviteSelect, an External Invite toggle and a Confirm button."""
+    def __init__(self, creator, timeout=20):
         super().__init__(timeout=timeout)
         self.confirmed = False
-        self.invite_select = InviteSelect(creator, guild)
+        self.external = False
+        self.invite_select = InviteSelect(creator)
         self.add_item(self.invite_select)
+        self.add_item(ExternalInviteButton(creator))
         self.add_item(ConfirmInviteButton(creator))
     async def on_timeout(self):
         self.stop()
@@ -108,8 +173,62 @@ async def prompt_user_ephemeral(ctx, prompt: str) -> str:
 
 @bot.event
 async def on_ready():
+    global reconciled
     print(f'Bot logged in as {bot.user.name}')
-    check_expiry.start()
+    if not reconciled:
+        reconciled = True
+        await reconcile_groups()
+        try:
+            synced = await bot.tree.sync()
+            print(f"Synced {len(synced)} slash commands")
+        except discord.HTTPException as e:
+            print(f"Could not sync slash commands: {e}")
+        for group in registry.all_groups():
+            expiry_scheduler.schedule(group)
+        # Kept on the bot so the task isn't garbage collected, and reported if it ever dies.
+        bot.expiry_task = asyncio.create_task(expiry_scheduler.run(), name="expiry-scheduler")
+        bot.expiry_task.add_done_callback(report_task_failure)
+
+def report_task_failure(task: asyncio.Task):
+    """Done-callback for background tasks that should run forever: print why one stopped."""
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        print(f"Background task {task.get_name()} crashed:")
+        traceback.print_exception(error)
+
+async def reconcile_groups():
+    """Match groups restored from the store against the live channels of their guilds.
+
+    Only channels the store recorded are ever deleted, and only with RECONCILE_DELETE_ORPHANS set.
+    """
+    orphans = []
+    for guild_id in registry.guild_ids():
+        guild = bot.get_guild(guild_id)
+        if guild is None:
+            # Another shard (or a guild the bot has left) owns these; keep them in the store, not in memory.
+            registry.drop_guild(guild_id)
+            continue
+        if guild.unavailable:
+            # During an outage a guild's channels only look missing; leave its groups alone.
+            continue
+        for group in registry.groups(guild_id):
+            if bot.get_channel(group.channel) is None:
+                # The text channel is gone, so the group can't be used any more.
+                registry.remove(group)
+                group_store.delete_group(group)
+                orphans.append(group.voice_channel)
+    if RECONCILE_DELETE_ORPHANS:
+        for channel_id in orphans:
+            channel = bot.get_channel(channel_id) if channel_id else None
+            if channel is None:
+                continue
+            try:
+                await channel.delete(reason="Orphaned study group channel")
+            except discord.HTTPException:
+                pass
+    print(f"Restored {registry.count()} study groups in {len(registry.guild_ids())} guilds")
 
 async def prompt_user(ctx, prompt: str) -> str:
     """Sends a prompt message and waits for a response from ctx.author."""
@@ -123,6 +242,23 @@ async def prompt_user(ctx, prompt: str) -> str:
         await ctx.send("⏰ You took too long to respond. Please try again.")
         return None
 
+async def resolve_members(guild: discord.Guild, user_ids) -> list:
+    """Members for user_ids: cached ones directly, the rest requested from the gateway in batches of 100."""
+    members = []
+    missing = []
+    for user_id in user_ids:
+        member = guild.get_member(user_id)
+        if member:
+            members.append(member)
+        else:
+            missing.append(user_id)
+    for start in range(0, len(missing), 100):
+        try:
+            members.extend(await guild.query_members(user_ids=missing[start:start + 100], cache=False))
+        except asyncio.TimeoutError:
+            print(f"Member lookup timed out in guild {guild.id}")
+    return members
+
 def get_general_channel(guild: discord.Guild) -> discord.TextChannel:
     """Returns the channel named 'general' or the first text channel if not found."""
     general = discord.utils.get(guild.text_channels, name="general")
@@ -131,10 +267,10 @@ def get_general_channel(guild: discord.Guild) -> discord.TextChannel:
     return general
 
 @bot.command(name='create')
+@commands.guild_only()
 async def create_group(ctx):
     """Creates a study group interactively and sets up both text and voice channels."""
-    global group_counter
-    if ctx.author.id in user_groups:
+    if registry.group_of(ctx.guild.id, ctx.author.id) is not None:
         await ctx.send("⚠️ You are already in a study group. Use `-leave` to exit your current group before creating a new one.")
         return
 
@@ -215,148 +351,366 @@ async def create_group(ctx):
             await ctx.send("⚠️ That doesn't look like a number. Try again.")
             return
 
+    group, group_text_channel, group_voice_channel = await setup_group(ctx.guild, ctx.author, subject, duration, max_members, secret_flag)
+    current_group_id = group.group_id
+
+    # For secret groups, show the invite view privately.
+    if secret_flag:
+        invite_view = InviteView(ctx.author, timeout=20)
+        invite_prompt = await ctx.send("👥 (Optional) [Secret] Search server members to invite (or turn on 'External Invite') and click Confirm:", view=invite_view, ephemeral=True)
+        await invite_view.wait()
+        try:
+            await invite_prompt.delete()
+        except Exception:
+            pass
+        await apply_secret_invites(group, ctx.author, invite_view, group_text_channel, group_voice_channel)
+        try:
+            await ctx.author.send(f"✅ Secret study group created with ID **{current_group_id}**!\nText Channel: {group_text_channel.mention}\nVoice Channel: {group_voice_channel.mention}")
+        except Exception:
+            pass
+    # For public groups, no additional invite prompt here; users can use -share.
+
+    await ctx.send(f"✅ Study group created with ID **{current_group_id}**!\nText Channel: {group_text_channel.mention}\nVoice Channel: {group_voice_channel.mention}")
+
+async def setup_group(guild: discord.Guild, creator: discord.Member, subject: str, duration: int, max_members: int, secret_flag: bool):
+    """Registers a new group and creates its text and voice channels (shared by -create and /create)."""
     now = datetime.datetime.utcnow()
     created_at = now
     expire_at = now + datetime.timedelta(minutes=duration)
 
-    current_group_id = group_counter
-    study_groups[current_group_id] = {
-        "group_id": current_group_id,
-        "subject": subject,
-        "max_members": max_members,
-        "created_by": ctx.author.name,
-        "created_at": created_at,
-        "expire_at": expire_at,
-        "members": [ctx.author.id],
-        "channel": None,
-        "voice_channel": None,
-        "alerted_10": False,
-        "alerted_5": False,
-        "alerted_1": False,
-        "secret": secret_flag
-    }
-    user_groups[ctx.author.id] = current_group_id
-
-    guild = ctx.guild
+    current_group_id = next_group_id(guild.id)
+    group = Group(
+        guild_id=guild.id,
+        group_id=current_group_id,
+        subject=subject,
+        max_members=max_members,
+        created_by=creator.name,
+        created_at=created_at,
+        expire_at=expire_at,
+        members=[creator.id],
+        secret=secret_flag
+    )
+    registry.add(group)
 
-    # Create a category for study groups if it doesn't exist.
-    category = discord.utils.get(guild.categories, name="Study Groups")
-    if not category:
-        category = await guild.create_category("Study Groups")
-    
     # Set up channel overwrites based on secret status.
     if secret_flag:
         text_overwrites = {
             guild.default_role: discord.PermissionOverwrite(view_channel=False),
-            ctx.author: discord.PermissionOverwrite(read_messages=True, send_messages=True)
+            creator: discord.PermissionOverwrite(read_messages=True, send_messages=True)
         }
         voice_overwrites = {
             guild.default_role: discord.PermissionOverwrite(view_channel=False, connect=False),
-            ctx.author: discord.PermissionOverwrite(view_channel=True, connect=True)
+            creator: discord.PermissionOverwrite(view_channel=True, connect=True)
         }
     else:
         text_overwrites = {
             guild.default_role: discord.PermissionOverwrite(read_messages=True, send_messages=False),
-            ctx.author: discord.PermissionOverwrite(read_messages=True, send_messages=True)
+            creator: discord.PermissionOverwrite(read_messages=True, send_messages=True)
         }
         voice_overwrites = {
             guild.default_role: discord.PermissionOverwrite(view_channel=True, connect=False),
-            ctx.author: discord.PermissionOverwrite(view_channel=True, connect=True)
+            creator: discord.PermissionOverwrite(view_channel=True, connect=True)
         }
 
-    text_channel_name = f"{subject}-{duration}min".replace(' ', '-').lower()
-    group_text_channel = await guild.create_text_channel(text_channel_name, category=category, overwrites=text_overwrites)
-    study_groups[current_group_id]["channel"] = group_text_channel.id
+    group_text_channel = None
+    try:
+        # Create a category for study groups if it doesn't exist.
+        category = discord.utils.get(guild.categories, name="Study Groups")
+        if not category:
+            category = await guild.create_category("Study Groups")
+
+        text_channel_name = f"{subject}-{duration}min".replace(' ', '-').lower()
+        group_text_channel = await guild.create_text_channel(text_channel_name, category=category, overwrites=text_overwrites)
+        group.channel = group_text_channel.id
 
-    voice_channel_name = f"{subject}-voice".replace(' ', '-').lower()
-    group_voice_channel = await guild.create_voice_channel(voice_channel_name, category=category, overwrites=voice_overwrites)
-    study_groups[current_group_id]["voice_channel"] = group_voice_channel.id
+        voice_channel_name = f"{subject}-voice".replace(' ', '-').lower()
+        group_voice_channel = await guild.create_voice_channel(voice_channel_name, category=category, overwrites=voice_overwrites)
+        group.voice_channel = group_voice_channel.id
+    except BaseException:
+        # Not scheduled or stored yet, so nothing would ever expire it: undo the registration here.
+        registry.remove(group)
+        if group_text_channel is not None:
+            try:
+                await group_text_channel.delete(reason="Study group setup failed")
+            except discord.HTTPException:
+                pass
+        raise
+
+    group_store.save_group(group)
+    expiry_scheduler.schedule(group)
 
-    # ----- Invite Prompt for Server Members (for both secret and public groups) -----
     try:
         await group_text_channel.send("📣 Use the **-invite** command to invite others to join your group!")
     except Exception:
         pass
 
-    # For secret groups, show the invite view privately.
-    if secret_flag:
-        invite_view = InviteView(ctx.author, guild, timeout=20)
-        invite_prompt = await ctx.send("👥 (Optional) [Secret] Select server members to invite (or choose 'External Invite') and click Confirm:", view=invite_view, ephemeral=True)
-        await invite_view.wait()
-        selected_invites = invite_view.invite_select.selected_values
-        try:
-            await invite_prompt.delete()
-        except Exception:
-            pass
-        if selected_invites:
-            for sel in selected_invites:
-                if sel == "external":
-                    invite = await group_text_channel.create_invite(max_age=0, unique=True)
-                    try:
-                        await ctx.author.send(f"External Invite Link for secret group '{subject}': {invite.url}")
-                    except Exception:
-                        pass
-                else:
-                    member_id = int(sel)
-                    member = guild.get_member(member_id)
-                    if member:
-                        await group_text_channel.set_permissions(member, read_messages=True, send_messages=True)
-                        await group_voice_channel.set_permissions(member, view_channel=True, connect=True)
-                        if member_id not in study_groups[current_group_id]["members"]:
-                            study_groups[current_group_id]["members"].append(member_id)
-                            user_groups[member_id] = current_group_id
-                        try:
-                            await member.send(f"You have been invited to join the study group **'{group_text_channel.name}'** (ID {current_group_id}).\n**Text Channel:** {group_text_channel.mention}\n**Voice Channel:** {group_voice_channel.mention}")
-                        except Exception:
-                            pass
-    # For public groups, no additional invite prompt here; users can use -share.
-    # -----------------------------------------------------------------------------
-
     # For public groups, announce creation in general channel.
     if not secret_flag:
         general = get_general_channel(guild)
         expire_str = expire_at.strftime("%H:%M UTC")
-        await general.send(f"✅ **Group Created:** ID **{current_group_id}** - **{subject}**. Expires at {expire_str}.")
-    else:
+        announcer.announce(general, f"✅ **Group Created:** ID **{current_group_id}** - **{subject}**. Expires at {expire_str}.")
+    return group, group_text_channel, group_voice_channel
+
+async def apply_secret_invites(group: Group, creator: discord.Member, invite_view: InviteView, group_text_channel, group_voice_channel):
+    """Lets in the members picked in a secret group's invite view and sends the external link if asked for."""
+    if invite_view.external:
+        invite = await group_text_channel.create_invite(max_age=0, unique=True)
         try:
-            await ctx.author.send(f"✅ Secret study group created with ID **{current_group_id}**!\nText Channel: {group_text_channel.mention}\nVoice Channel: {group_voice_channel.mention}")
+            await creator.send(f"External Invite Link for secret group '{group.subject}': {invite.url}")
+        except Exception:
+            pass
+    for member in invite_view.invite_select.selected_members:
+        await group_text_channel.set_permissions(member, read_messages=True, send_messages=True)
+        await group_voice_channel.set_permissions(member, view_channel=True, connect=True)
+        if member.id not in group.members:
+            registry.add_member(group, member.id)
+            group_store.save_group(group)
+        try:
+            await member.send(f"You have been invited to join the study group **'{group_text_channel.name}'** (ID {group.group_id}).\n**Text Channel:** {group_text_channel.mention}\n**Voice Channel:** {group_voice_channel.mention}")
         except Exception:
             pass
 
-    await ctx.send(f"✅ Study group created with ID **{current_group_id}**!\nText Channel: {group_text_channel.mention}\nVoice Channel: {group_voice_channel.mention}")
-    group_counter += 1
+# ----------------- /create -----------------
+# Collects subject, duration, max members and the secret flag in one interaction (slash options, or a
+# modal for whatever was left out), so no wait_for("message") listeners are left pending. -create keeps
+# the step-by-step prompts as a fallback.
+class CreateGroupModal(discord.ui.Modal, title="Create a study group"):
+    subject = discord.ui.TextInput(label="Subject", max_length=80)
+    duration = discord.ui.TextInput(label="Duration (minutes)", max_length=5)
+    max_members = discord.ui.TextInput(label="Max members (including you)", max_length=4)
+    secret = discord.ui.TextInput(label="Secret group? (yes/no)", default="no", max_length=3, required=False)
+
+    def __init__(self, subject: str = None, duration: int = None, max_members: int = None, secret: bool = False):
+        super().__init__(timeout=300)
+        self.subject.default = subject
+        self.duration.default = str(duration) if duration else None
+        self.max_members.default = str(max_members) if max_members else None
+        self.secret.default = "yes" if secret else "no"
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            duration = int(self.duration.value)
+            max_members = int(self.max_members.value)
+        except ValueError:
+            await interaction.response.send_message("⚠️ Duration and max members must be numbers. Try again.", ephemeral=True)
+            return
+        if duration < 1 or max_members < 1:
+            await interaction.response.send_message("⚠️ Duration and max members must be greater than 0.", ephemeral=True)
+            return
+        secret_flag = self.secret.value.strip().lower() in ("yes", "y")
+        await create_from_interaction(interaction, self.subject.value.strip(), duration, max_members, secret_flag)
+
+async def create_from_interaction(interaction: discord.Interaction, subject: str, duration: int, max_members: int, secret_flag: bool):
+    """Creates a group from a completed /create (or its modal); secret groups only ever get ephemeral replies."""
+    if registry.group_of(interaction.guild.id, interaction.user.id) is not None:
+        await interaction.response.send_message("⚠️ You are already in a study group. Use `-leave` to exit your current group before creating a new one.", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=secret_flag, thinking=True)
+    group, group_text_channel, group_voice_channel = await setup_group(interaction.guild, interaction.user, subject, duration, max_members, secret_flag)
+    created = f"✅ Study group created with ID **{group.group_id}**!\nText Channel: {group_text_channel.mention}\nVoice Channel: {group_voice_channel.mention}"
+    if not secret_flag:
+        await interaction.followup.send(created)
+        return
+    invite_view = InviteView(interaction.user, timeout=60)
+    await interaction.followup.send(f"{created}\n👥 (Optional) Search server members to invite (or turn on 'External Invite') and click Confirm:",
+                                    view=invite_view, ephemeral=True)
+    await invite_view.wait()
+    await apply_secret_invites(group, interaction.user, invite_view, group_text_channel, group_voice_channel)
+
+@bot.tree.command(name="create", description="Create a study group")
+@app_commands.guild_only()
+@app_commands.describe(subject="What the group will study", duration="How many minutes the group should exist",
+                       max_members="How many people (including you) can join", secret="Only invited members can see the group")
+async def create_slash(interaction: discord.Interaction, subject: app_commands.Range[str, 1, 80] = None, duration: app_commands.Range[int, 1] = None,
+                       max_members: app_commands.Range[int, 1] = None, secret: bool = False):
+    if registry.group_of(interaction.guild.id, interaction.user.id) is not None:
+        await interaction.response.send_message("⚠️ You are already in a study group. Use `-leave` to exit your current group before creating a new one.", ephemeral=True)
+        return
+    if subject is None or duration is None or max_members is None:
+        await interaction.response.send_modal(CreateGroupModal(subject, duration, max_members, secret))
+        return
+    await create_from_interaction(interaction, subject, duration, max_members, secret)
+# -------------------------------------------
 
 @bot.command(name='list')
+@commands.guild_only()
 async def list_groups(ctx):
     """Lists all available (public) study groups."""
     # Do not display secret groups.
-    public_groups = [group for group in study_groups.values() if not group.get("secret", False)]
-    if not public_groups:
+    if not registry.public_groups(ctx.guild.id):
         await ctx.send("ℹ️ There are no public study groups created yet.")
         return
-    embed = discord.Embed(title="Public Study Groups Overview", color=discord.Color.blue(), timestamp=datetime.datetime.utcnow())
-    for group in public_groups:
-        created_time = group["created_at"].strftime("%Y-%m-%d %H:%M UTC")
-        member_count = f"{len(group['members'])}/{group['max_members']}"
-        expire_str = group["expire_at"].strftime("%H:%M UTC")
-        embed.add_field(
-            name=f"Group ID {group['group_id']}: {group['subject']}",
-            value=(f"**Created by:** {group['created_by']}\n"
-                   f"**Created at:** {created_time}\n"
-                   f"**Expires at:** {expire_str}\n"
-                   f"**Members:** {member_count}"),
-            inline=False
-        )
-    await ctx.send(embed=embed)
+    view = GroupListView(ctx.guild.id)
+    await ctx.send(embed=view.render(), view=view)
+
+# Discord allows 25 options per Select and 25 fields per embed, so group pickers and -list are paged.
+SELECT_PAGE_SIZE = 24  # one option is kept for the "None" choice
+LIST_PAGE_SIZE = 10
+
+def group_label(group: Group, suffix: str = "") -> str:
+    """Select option / autocomplete label for a group, within Discord's 100 character limit."""
+    secret_status = " (Secret)" if group.secret else ""
+    label = f"Group {group.group_id}: {group.subject}{secret_status}{suffix}"
+    return label if len(label) <= 100 else label[:99] + "…"
+
+class PageButton(Button):
+    """Moves a paged view one page back or forward."""
+    def __init__(self, step: int, disabled: bool):
+        super().__init__(label="◀ Prev" if step < 0 else "Next ▶", style=discord.ButtonStyle.secondary, disabled=disabled)
+        self.step = step
+
+    async def callback(self, interaction: discord.Interaction):
+        view = self.view  # render() clears the view's items, this button included
+        view.page += self.step
+        content = view.render()
+        if not view.shown:
+            await interaction.response.edit_message(content="ℹ️ There are no study groups left.", embed=None, view=None)
+        elif isinstance(content, discord.Embed):
+            await interaction.response.edit_message(embed=content, view=view)
+        else:
+            await interaction.response.edit_message(view=view)
+
+class PagedView(View, ABC):
+    """Shows one page of a guild's groups at a time; a page is only built when the user moves to it."""
+    page_size = SELECT_PAGE_SIZE
+
+    def __init__(self, guild_id: int):
+        super().__init__()
+        self.guild_id = guild_id
+        self.page = 0
+        self.page_count = 1
+        self.shown = 0  # groups on the current page; 0 means there are none left at all
+
+    @abstractmethod
+    def groups(self) -> list:
+        """Every group the view pages through, in display order."""
+
+    def page_groups(self) -> list:
+        """The groups on the current page, read fresh from the registry."""
+        groups = self.groups()
+        self.page_count = max(1, -(-len(groups) // self.page_size))
+        self.page = min(max(self.page, 0), self.page_count - 1)
+        start = self.page * self.page_size
+        page = groups[start:start + self.page_size]
+        self.shown = len(page)
+        return page
+
+    def add_page_buttons(self):
+        if self.page_count > 1:
+            self.add_item(PageButton(-1, disabled=self.page == 0))
+            self.add_item(PageButton(1, disabled=self.page >= self.page_count - 1))
+
+class GroupPickerView(PagedView):
+    """A paged group Select: subclasses say which groups to offer and which Select to use."""
+    select_class = None
+
+    def __init__(self, guild_id: int):
+        super().__init__(guild_id)
+        self.render()
+
+    def render(self):
+        self.clear_items()
+        select = self.select_class(self.page_groups())
+        if not select.options:
+            return  # the groups went away since the menu was posted, and Discord rejects an empty Select
+        if self.page_count > 1:
+            select.placeholder = f"{select.placeholder} (page {self.page + 1}/{self.page_count})"
+        self.add_item(select)
+        self.add_page_buttons()
+
+class GroupListView(PagedView):
+    """Pages the -list embed."""
+    page_size = LIST_PAGE_SIZE
+
+    def groups(self) -> list:
+        return registry.public_groups(self.guild_id)
+
+    def render(self) -> discord.Embed:
+        embed = discord.Embed(title="Public Study Groups Overview", color=discord.Color.blue(), timestamp=datetime.datetime.utcnow())
+        for group in self.page_groups():
+            created_time = group.created_at.strftime("%Y-%m-%d %H:%M UTC")
+            expire_str = group.expire_at.strftime("%H:%M UTC")
+            embed.add_field(
+                name=f"Group ID {group.group_id}: {group.subject}"[:256],
+                value=(f"**Created by:** {group.created_by}\n"
+                       f"**Created at:** {created_time}\n"
+                       f"**Expires at:** {expire_str}\n"
+                       f"**Members:** {group.member_count}"),
+                inline=False
+            )
+        if self.page_count > 1:
+            embed.set_footer(text=f"Page {self.page + 1}/{self.page_count}")
+        self.clear_items()
+        self.add_page_buttons()
+        return embed
+
+async def join_group_by_id(interaction: discord.Interaction, group_id: int):
+    """Adds the interaction user to a group (shared by the -join menu and /join)."""
+    group = registry.get(interaction.guild.id, group_id)
+    if group is None:
+        await interaction.response.send_message("⚠️ The selected group no longer exists.", ephemeral=True)
+        return
+    if interaction.user.id in group.members:
+        await interaction.response.send_message("ℹ️ You're already in this group.", ephemeral=True)
+        return
+    if group.is_full:
+        await interaction.response.send_message("⚠️ Sorry, this group is full.", ephemeral=True)
+        return
+    if registry.group_of(interaction.guild.id, interaction.user.id) is not None:
+        await interaction.response.send_message("⚠️ You are already in a study group. Use `-leave` to exit your current group.", ephemeral=True)
+        return
+
+    registry.add_member(group, interaction.user.id)
+    group_store.save_group(group)
+
+    text_channel = bot.get_channel(group.channel)
+    if text_channel:
+        await text_channel.set_permissions(interaction.user, read_messages=True, send_messages=True)
+    voice_channel = bot.get_channel(group.voice_channel)
+    if voice_channel:
+        await voice_channel.set_permissions(interaction.user, view_channel=True, connect=True)
+
+    await interaction.response.send_message(f"✅ You joined Group {group_id}: {group.subject}.", ephemeral=True)
+    guild = interaction.guild
+    general = get_general_channel(guild)
+    expire_str = group.expire_at.strftime("%H:%M UTC")
+    announcer.announce(general, f"👤 **{interaction.user.name}** joined Group **{group_id}: {group.subject}**. Members: {group.member_count}. Expires at: {expire_str}.")
+
+async def show_group_members(interaction: discord.Interaction, group_id: int):
+    """Lists a group's members to the interaction user (shared by the -members menu and /members)."""
+    group = registry.get(interaction.guild.id, group_id)
+    if group is None:
+        await interaction.response.send_message("⚠️ The selected group no longer exists.", ephemeral=True)
+        return
+    # Looking up uncached members can take a moment; defer so the interaction doesn't expire meanwhile.
+    await interaction.response.defer(ephemeral=True)
+    member_names = [member.display_name for member in await resolve_members(interaction.guild, group.members)]
+    members_str = ", ".join(member_names) if member_names else "No members found."
+    await interaction.followup.send(f"**Members in Group {group_id} ({group.subject}):**\n{members_str}", ephemeral=True)
+
+async def share_group(interaction: discord.Interaction, group_id: int):
+    """Posts a group's share card (shared by the -share menu and /share)."""
+    group = registry.get(interaction.guild.id, group_id)
+    if group is None:
+        await interaction.response.send_message("⚠️ The selected group no longer exists.", ephemeral=True)
+        return
+    embed = discord.Embed(
+        title=f"📢 Study Group {group_id}: {group.subject}"[:256],
+        color=discord.Color.green(),
+        timestamp=datetime.datetime.utcnow()
+    )
+    embed.add_field(name="👤 Created By", value=group.created_by, inline=True)
+    embed.add_field(name="👥 Members", value=group.member_count, inline=True)
+    embed.add_field(name="⏳ Expires at", value=group.expire_at.strftime("%H:%M UTC"), inline=True)
+    embed.set_footer(text="Share this message to invite more members!")
+    await interaction.response.send_message(embed=embed)
 
 class GroupSelect(Select):
     """Dropdown menu for joining study groups."""
-    def __init__(self):
+    def __init__(self, groups: list):
         options = []
-        for group in study_groups.values():
-            secret_status = " (Secret)" if group.get("secret", False) else ""
-            label = f"Group {group['group_id']}: {group['subject']}{secret_status} ({len(group['members'])}/{group['max_members']})"
-            options.append(discord.SelectOption(label=label, value=str(group['group_id'])))
+        for group in groups:
+            options.append(discord.SelectOption(label=group_label(group, f" ({group.member_count})"), value=str(group.group_id)))
         options.append(discord.SelectOption(label="None (Create your own group)", value="none"))
         super().__init__(placeholder="Select a study group...", min_values=1, max_values=1, options=options)
 
@@ -370,61 +724,34 @@ class GroupSelect(Select):
         except ValueError:
             await interaction.response.send_message("⚠️ Something went wrong. Try again.", ephemeral=True)
             return
-        if group_id not in study_groups:
-            await interaction.response.send_message("⚠️ The selected group no longer exists.", ephemeral=True)
-            return
-        group = study_groups[group_id]
-        if interaction.user.id in group["members"]:
-            await interaction.response.send_message("ℹ️ You're already in this group.", ephemeral=True)
-            return
-        if len(group["members"]) >= group["max_members"]:
-            await interaction.response.send_message("⚠️ Sorry, this group is full.", ephemeral=True)
-            return
-        if interaction.user.id in user_groups:
-            await interaction.response.send_message("⚠️ You are already in a study group. Use `-leave` to exit your current group.", ephemeral=True)
-            return
-
-        group["members"].append(interaction.user.id)
-        user_groups[interaction.user.id] = group_id
+        await join_group_by_id(interaction, group_id)
 
-        text_channel = bot.get_channel(group["channel"])
-        if text_channel:
-            await text_channel.set_permissions(interaction.user, read_messages=True, send_messages=True)
-        voice_channel = bot.get_channel(group["voice_channel"])
-        if voice_channel:
-            await voice_channel.set_permissions(interaction.user, view_channel=True, connect=True)
+class GroupJoinView(GroupPickerView):
+    select_class = GroupSelect
 
-        await interaction.response.send_message(f"✅ You joined Group {group_id}: {group['subject']}.", ephemeral=True)
-        guild = interaction.guild
-        general = get_general_channel(guild)
-        expire_str = group["expire_at"].strftime("%H:%M UTC")
-        member_count = f"{len(group['members'])}/{group['max_members']}"
-        await general.send(f"👤 **{interaction.user.name}** joined Group **{group_id}: {group['subject']}**. Members: {member_count}. Expires at: {expire_str}.")
+    def groups(self) -> list:
+        # Only groups with a free seat can be joined.
+        return registry.open_groups(self.guild_id)
 
-class GroupJoinView(View):
-    def __init__(self):
-        super().__init__()
-        self.add_item(GroupSelect())
 @bot.command(name='join')
+@commands.guild_only()
 async def join_group(ctx):
     """Allows users to join an existing study group via dropdown."""
-    if ctx.author.id in user_groups:
+    if registry.group_of(ctx.guild.id, ctx.author.id) is not None:
         await ctx.send("⚠️ You are already in a study group. Use **-leave** to exit your current group before joining another.")
         return
-    if not study_groups:
+    if not registry.count(ctx.guild.id):
         await ctx.send("ℹ️ There are no existing study groups. Use **-create** to start one.")
         return
-    view = GroupJoinView()
+    view = GroupJoinView(ctx.guild.id)
     await ctx.send("Select a study group from the dropdown:", view=view)
 
 class MembersSelect(Select):
     """Dropdown to select a group to view its members."""
-    def __init__(self):
+    def __init__(self, groups: list):
         options = []
-        for group in study_groups.values():
-            secret_status = " (Secret)" if group.get("secret", False) else ""
-            label = f"Group {group['group_id']}: {group['subject']}{secret_status}"
-            options.append(discord.SelectOption(label=label, value=str(group['group_id'])))
+        for group in groups:
+            options.append(discord.SelectOption(label=group_label(group), value=str(group.group_id)))
         super().__init__(placeholder="Select a group to view its members...", min_values=1, max_values=1, options=options)
     
     async def callback(self, interaction: discord.Interaction):
@@ -433,114 +760,150 @@ class MembersSelect(Select):
         except ValueError:
             await interaction.response.send_message("⚠️ Invalid selection.", ephemeral=True)
             return
-        if group_id not in study_groups:
-            await interaction.response.send_message("⚠️ The selected group no longer exists.", ephemeral=True)
-            return
-        group = study_groups[group_id]
-        member_names = []
-        for user_id in group["members"]:
-            member = interaction.guild.get_member(user_id)
-            if member:
-                member_names.append(member.display_name)
-        members_str = ", ".join(member_names) if member_names else "No members found."
-        await interaction.response.send_message(f"**Members in Group {group_id} ({group['subject']}):**\n{members_str}", ephemeral=True)
-
-class MembersView(View):
-    def __init__(self):
-        super().__init__()
-        self.add_item(MembersSelect())
+        await show_group_members(interaction, group_id)
+
+class MembersView(GroupPickerView):
+    select_class = MembersSelect
+
+    def groups(self) -> list:
+        return registry.groups(self.guild_id)
 
 @bot.command(name='members')
+@commands.guild_only()
 async def show_members(ctx):
     """Displays members of a selected study group via dropdown."""
-    if not study_groups:
+    if not registry.count(ctx.guild.id):
+        await ctx.send("ℹ️ There are no study groups created yet.")
+        return
+    view = MembersView(ctx.guild.id)
+    if not view.shown:
         await ctx.send("ℹ️ There are no study groups created yet.")
         return
-    view = MembersView()
     await ctx.send("Select a study group to view its members:", view=view)
 
 class ShareSelect(Select):
     """Dropdown to select a group to share."""
-    def __init__(self):
+    def __init__(self, groups: list):
         options = []
-        for group in study_groups.values():
-            secret_status = " (Secret)" if group.get("secret", False) else ""
-            options.append(discord.SelectOption(label=f"Group {group['group_id']}: {group['subject']}{secret_status}",
-                                                 description=f"Created by {group['created_by']}, {len(group['members'])}/{group['max_members']} members"))
-        options.append(discord.SelectOption(label="None", description="Cancel and create your own group"))
+        for group in groups:
+            options.append(discord.SelectOption(label=group_label(group), value=str(group.group_id),
+                                                 description=f"Created by {group.created_by}, {group.member_count} members"[:100]))
+        options.append(discord.SelectOption(label="None", value="none", description="Cancel and create your own group"))
         super().__init__(placeholder="📚 Select a study group to share", options=options, min_values=1, max_values=1)
     async def callback(self, interaction: discord.Interaction):
         selected_value = self.values[0]
-        if selected_value == "None":
+        if selected_value == "none":
             await interaction.response.send_message("❌ You chose not to share any group. Use `-create` to start your own!", ephemeral=True)
         else:
-            group_id = int(selected_value.split(':')[0].split()[-1])
-            group = study_groups.get(group_id)
-            if group:
-                member_count = f"{len(group['members'])}/{group['max_members']}"
-                embed = discord.Embed(
-                    title=f"📢 Study Group {group_id}: {group['subject']}",
-                    color=discord.Color.green(),
-                    timestamp=datetime.datetime.utcnow()
-                )
-                embed.add_field(name="👤 Created By", value=group["created_by"], inline=True)
-                embed.add_field(name="👥 Members", value=member_count, inline=True)
-                embed.add_field(name="⏳ Expires at", value=group["expire_at"].strftime("%H:%M UTC"), inline=True)
-                embed.set_footer(text="Share this message to invite more members!")
-                await interaction.response.send_message(embed=embed)
+            await share_group(interaction, int(selected_value))
                 
-class ShareView(View):
-    def __init__(self):
-        super().__init__()
-        self.add_item(ShareSelect())
+class ShareView(GroupPickerView):
+    select_class = ShareSelect
+
+    def groups(self) -> list:
+        return registry.groups(self.guild_id)
 
 @bot.command(name='share')
+@commands.guild_only()
 async def share_groups(ctx):
     """Allows users to share study groups interactively by selecting a Group ID."""
-    if not study_groups:
+    if not registry.count(ctx.guild.id):
         await ctx.send("ℹ️ There are no study groups available to share.")
         return
-    view = ShareView()
+    view = ShareView(ctx.guild.id)
     await ctx.send("📢 **Select a study group to share:**", view=view)
 
+# ----------------- Slash commands -----------------
+# /join, /members and /share take the group straight from an autocompleted option, so they work no
+# matter how many groups a server has. Suggestions come from the registry's subject index.
+async def group_autocomplete(interaction: discord.Interaction, current: str) -> list:
+    current = current.strip()
+    groups = registry.search(interaction.guild_id, current, limit=25)
+    if current.isdigit():
+        by_id = registry.get(interaction.guild_id, int(current))
+        if by_id is not None and by_id not in groups:
+            groups = [by_id] + groups[:24]
+    return [app_commands.Choice(name=group_label(group), value=group.group_id) for group in groups]
+
+@bot.tree.command(name="join", description="Join a study group")
+@app_commands.guild_only()
+@app_commands.describe(group="Start typing the group's subject (or its ID)")
+@app_commands.autocomplete(group=group_autocomplete)
+async def join_slash(interaction: discord.Interaction, group: int):
+    await join_group_by_id(interaction, group)
+
+@bot.tree.command(name="members", description="Show the members of a study group")
+@app_commands.guild_only()
+@app_commands.describe(group="Start typing the group's subject (or its ID)")
+@app_commands.autocomplete(group=group_autocomplete)
+async def members_slash(interaction: discord.Interaction, group: int):
+    await show_group_members(interaction, group)
+
+@bot.tree.command(name="share", description="Share a study group's details")
+@app_commands.guild_only()
+@app_commands.describe(group="Start typing the group's subject (or its ID)")
+@app_commands.autocomplete(group=group_autocomplete)
+async def share_slash(interaction: discord.Interaction, group: int):
+    await share_group(interaction, group)
+
+@bot.tree.command(name="list", description="List the public study groups")
+@app_commands.guild_only()
+async def list_slash(interaction: discord.Interaction):
+    if not registry.public_groups(interaction.guild_id):
+        await interaction.response.send_message("ℹ️ There are no public study groups created yet.", ephemeral=True)
+        return
+    view = GroupListView(interaction.guild_id)
+    await interaction.response.send_message(embed=view.render(), view=view)
+# ---------------------------------------------------
+
+@bot.command(name='ask')
+async def ask_question(ctx, *, question: str = None):
+    """
+    Answers a question about the last PDF uploaded in this channel, or the one you reply to.
+    Usage: -ask <question>
+    """
+    if not question:
+        await ctx.send("❓ Usage: `-ask <question>` about the last PDF uploaded here (or reply to one).", delete_after=10)
+        return
+    await submit_question(ctx.message, question)
+
 @bot.command(name='leave')
+@commands.guild_only()
 async def leave_group(ctx):
     """Allows a user to leave the study group they have joined."""
-    if ctx.author.id not in user_groups:
+    group = registry.group_of(ctx.guild.id, ctx.author.id)
+    if group is None:
         await ctx.send("⚠️ You are not in any study group.")
         return
-    group_id = user_groups.pop(ctx.author.id)
-    group = study_groups.get(group_id)
-    if group and ctx.author.id in group["members"]:
-        group["members"].remove(ctx.author.id)
-        text_channel = bot.get_channel(group["channel"])
+    group_id = group.group_id
+    if ctx.author.id in group.members:
+        registry.remove_member(group, ctx.author.id)
+        group_store.save_group(group)
+        text_channel = bot.get_channel(group.channel)
         if text_channel:
             await text_channel.set_permissions(ctx.author, overwrite=None)
-        voice_channel = bot.get_channel(group["voice_channel"])
+        voice_channel = bot.get_channel(group.voice_channel)
         if voice_channel:
             await voice_channel.set_permissions(ctx.author, overwrite=None)
-        await ctx.send(f"🚪 You have left Group {group_id}: {group['subject']}.")
+        await ctx.send(f"🚪 You have left Group {group_id}: {group.subject}.")
         # Only public groups notify general.
-        if not group.get("secret", False):
+        if not group.secret:
             guild = ctx.guild
             general = get_general_channel(guild)
-            expire_str = group["expire_at"].strftime('%H:%M UTC')
-            member_count = f"{len(group['members'])}/{group['max_members']}"
-            await general.send(f"👤 **{ctx.author.name}** left Group **{group_id}: {group['subject']}**. Members: {member_count}. Expires at: {expire_str}.")
+            expire_str = group.expire_at.strftime('%H:%M UTC')
+            announcer.announce(general, f"👤 **{ctx.author.name}** left Group **{group_id}: {group.subject}**. Members: {group.member_count}. Expires at: {expire_str}.")
     else:
         await ctx.send("⚠️ Something went wrong. Could not leave the group.")
 
 @bot.command(name='extend')
+@commands.guild_only()
 async def extend_group(ctx):
     """Allows a user to extend the expiration time of their study group (affecting both text and voice channels)."""
-    if ctx.author.id not in user_groups:
+    group = registry.group_of(ctx.guild.id, ctx.author.id)
+    if group is None:
         await ctx.send("⚠️ You are not in any study group.")
         return
-    group_id = user_groups[ctx.author.id]
-    group = study_groups.get(group_id)
-    if not group:
-        await ctx.send("⚠️ Group not found.")
-        return
+    group_id = group.group_id
     extension_str = await prompt_user(ctx, "⏳ How many minutes do you want to extend the group?")
     if extension_str is None:
         return
@@ -552,85 +915,79 @@ async def extend_group(ctx):
     except ValueError:
         await ctx.send("⚠️ Invalid number.")
         return
-    group['expire_at'] += datetime.timedelta(minutes=extension)
+    group.expire_at += datetime.timedelta(minutes=extension)
     # Reset alert flags so that alerts are triggered again after extension.
-    group["alerted_10"] = False
-    group["alerted_5"] = False
-    group["alerted_1"] = False
-    new_expire_str = group['expire_at'].strftime('%H:%M UTC')
+    group.alerted_10 = False
+    group.alerted_5 = False
+    group.alerted_1 = False
+    group_store.save_group(group)
+    expiry_scheduler.schedule(group)
+    new_expire_str = group.expire_at.strftime('%H:%M UTC')
     await ctx.send(f"✅ Group {group_id} extended. New expiration time: {new_expire_str}.")
     guild = ctx.guild
-    if not group.get("secret", False):
+    if not group.secret:
         general = get_general_channel(guild)
-        await general.send(f"⏳ **Group Extended:** Group {group_id} - {group['subject']} now expires at {new_expire_str}.")
+        announcer.announce(general, f"⏳ **Group Extended:** Group {group_id} - {group.subject} now expires at {new_expire_str}.")
 
 # New command: -invite (for users already in a group)
 @bot.command(name='invite')
+@commands.guild_only()
 async def invite_command(ctx):
     """Allows a user already in a group to invite more members."""
-    if ctx.author.id not in user_groups:
-        await ctx.send("⚠️ You are not in any study group.")
-        return
-    group_id = user_groups[ctx.author.id]
-    group = study_groups.get(group_id)
+    group = registry.group_of(ctx.guild.id, ctx.author.id)
     if group is None:
-        await ctx.send("⚠️ Group not found.")
+        await ctx.send("⚠️ You are not in any study group.")
         return
-    if len(group["members"]) >= group["max_members"]:
+    group_id = group.group_id
+    if group.is_full:
         await ctx.send("⚠️ Your group is already full.")
         return
     # Inform in the group text channel to use -invite.
-    group_text_channel = bot.get_channel(group["channel"])
+    group_text_channel = bot.get_channel(group.channel)
     if group_text_channel:
         await group_text_channel.send("📣 Use the **-invite** command to invite others to join your group!")
     # Show invite selection view.
-    invite_view = InviteView(ctx.author, ctx.guild, timeout=20)
-    invite_prompt = await ctx.send("👥 Select server members to invite (or choose 'External Invite') and click Confirm:", view=invite_view, ephemeral=True)
+    invite_view = InviteView(ctx.author, timeout=20)
+    invite_prompt = await ctx.send("👥 Search server members to invite (or turn on 'External Invite') and click Confirm:", view=invite_view, ephemeral=True)
     await invite_view.wait()
-    selected_invites = invite_view.invite_select.selected_values
     try:
         await invite_prompt.delete()
     except Exception:
         pass
-    if selected_invites:
-        for sel in selected_invites:
-            if sel == "external":
-                invite = await group_text_channel.create_invite(max_age=0, unique=True)
-                try:
-                    await ctx.author.send(f"External Invite Link for group '{group['subject']}': {invite.url}")
-                except Exception:
-                    pass
-            else:
-                member_id = int(sel)
-                member = ctx.guild.get_member(member_id)
-                if member:
-                    await group_text_channel.set_permissions(member, read_messages=True, send_messages=True)
-                    voice_channel = bot.get_channel(group["voice_channel"])
-                    if voice_channel:
-                        await voice_channel.set_permissions(member, view_channel=True, connect=True)
-                    if member_id not in group["members"]:
-                        group["members"].append(member_id)
-                        user_groups[member_id] = group_id
-                    try:
-                        await member.send(
-                            f"You have been invited to join the study group **'{group['subject']}'** (ID {group_id}).\n"
-                            f"CHECK OUT \nText Channel {group_text_channel.mention} \nVoice Channel {voice_channel.mention}"
-                        )
-                    except Exception:
-                        pass
+    if invite_view.external:
+        invite = await group_text_channel.create_invite(max_age=0, unique=True)
+        try:
+            await ctx.author.send(f"External Invite Link for group '{group.subject}': {invite.url}")
+        except Exception:
+            pass
+    for member in invite_view.invite_select.selected_members:
+        await group_text_channel.set_permissions(member, read_messages=True, send_messages=True)
+        voice_channel = bot.get_channel(group.voice_channel)
+        if voice_channel:
+            await voice_channel.set_permissions(member, view_channel=True, connect=True)
+        if member.id not in group.members:
+            registry.add_member(group, member.id)
+            group_store.save_group(group)
+        try:
+            await member.send(
+                f"You have been invited to join the study group **'{group.subject}'** (ID {group_id}).\n"
+                f"CHECK OUT \nText Channel {group_text_channel.mention} \nVoice Channel {voice_channel.mention}"
+            )
+        except Exception:
+            pass
     await ctx.send("✅ Invite processing complete.", delete_after=5)
 
 @bot.command(name='secret')
+@commands.guild_only()
 @commands.has_permissions(administrator=True)
 async def secret_groups(ctx):
     """(Admin Only) Displays details of all secret groups."""
     secret_info = []
-    for group in study_groups.values():
-        if group.get("secret", False):
-            expire_str = group["expire_at"].strftime("%Y-%m-%d %H:%M UTC")
-            channel = bot.get_channel(group["channel"])
-            channel_name = channel.name if channel else "N/A"
-            secret_info.append(f"ID {group['group_id']}: {group['subject']} | Channel: {channel_name} | Created by: {group['created_by']} | Expires at: {expire_str}")
+    for group in registry.secret_groups(ctx.guild.id):
+        expire_str = group.expire_at.strftime("%Y-%m-%d %H:%M UTC")
+        channel = bot.get_channel(group.channel)
+        channel_name = channel.name if channel else "N/A"
+        secret_info.append(f"ID {group.group_id}: {group.subject} | Channel: {channel_name} | Created by: {group.created_by} | Expires at: {expire_str}")
     if secret_info:
         response = "\n".join(secret_info)
     else:
@@ -657,6 +1014,10 @@ async def help_command(ctx):
     embed.add_field(name="**-members**", value="👤 View all members in a study group.", inline=False)
     embed.add_field(name="**-extend**", value="⏳ Extend the expiration time of your study group.", inline=False)
     embed.add_field(name="**-invite**", value="✉️ (In-group) Invite additional members to your group.", inline=False)
+    embed.add_field(name="**/create**", value="⚡ Create a study group in one step: fill in the options (or the form that pops up).", inline=False)
+    embed.add_field(name="**PDF upload**", value="📄 Upload a PDF to get a summary or flashcards in your DMs. Add `pages 3-10` to your message to use only those pages.", inline=False)
+    embed.add_field(name="**-ask <question>**", value="🔎 Ask about the last PDF uploaded in the channel (or reply to one). Only the relevant passages are sent to the AI.", inline=False)
+    embed.add_field(name="**/join, /members, /share, /list**", value="🔎 Slash versions that let you search groups by subject as you type.", inline=False)
     embed.set_footer(text="Happy Studying! 🚀")
     await ctx.send(embed=embed)
 
@@ -670,59 +1031,133 @@ async def clear_all(ctx):
     deleted = await ctx.channel.purge(limit=None)
     await ctx.send(f"🗑️ Cleared {len(deleted)} messages in this channel.", delete_after=3)
 
-# Background task to check for group expiration and send alerts.
-@tasks.loop(minutes=1)
-async def check_expiry():
-    now = datetime.datetime.utcnow()
-    expired_groups = []
-    for group_id, group in list(study_groups.items()):
-        time_left = (group["expire_at"] - now).total_seconds()
-        total_duration = (group["expire_at"] - group["created_at"]).total_seconds() if group.get("created_at") else 0
-        channel = bot.get_channel(group["channel"]) if group.get("channel") else None
-
-        if total_duration >= 600 and time_left <= 600 and time_left > 300 and not group.get("alerted_10", False):
-            if channel:
-                await channel.send("⏰ **Alert:** This group will end in **10 minutes**! Type **-extend** to extend the time.")
-            group["alerted_10"] = True
-
-        if total_duration >= 300 and time_left <= 300 and time_left > 60 and not group.get("alerted_5", False):
-            if channel:
-                await channel.send("⏰ **Alert:** This group will end in **5 minutes**! Type **-extend** to extend the time.")
-            group["alerted_5"] = True
-
-        if time_left <= 60 and time_left > 0 and not group.get("alerted_1", False):
-            if channel:
-                await channel.send("⏰ **Alert:** This group will end in **1 minute**! Type **-extend** to extend the time.")
-            group["alerted_1"] = True
-
-        if time_left <= 0:
-            expired_groups.append(group_id)
-
-    for group_id in expired_groups:
-        group = study_groups.pop(group_id, None)
-        if group:
-            guild = bot.guilds[0]
-            if not group.get("secret", False):
-                general = get_general_channel(guild)
-            else:
-                general = None
-            channel = bot.get_channel(group["channel"]) if group.get("channel") else None
-            if channel:
-                await channel.send("🗑️ This study group has now ended.")
-                await channel.delete()
-            voice_channel = bot.get_channel(group["voice_channel"]) if group.get("voice_channel") else None
-            if voice_channel:
-                await voice_channel.delete()
-            if general:
-                await general.send(f"🗑️ **Group Deleted:** ID **{group_id}** - **{group['subject']}** has been deleted as per the set time.")
-            for user_id in group["members"]:
-                if user_groups.get(user_id) == group_id:
-                    user_groups.pop(user_id, None)
-
-keep_alive()
-
-try:
-    bot.run(os.getenv("TOKEN"))
-except discord.errors.HTTPException as e:
-    print(f"Failed to connect to Discord: {e}")
-    print("Please check your bot token and internet connection")
\ No newline at end of file
+@bot.command(name='profile')
+@commands.has_permissions(administrator=True)
+async def profile_command(ctx, seconds: int = 10):
+    """
+    Samples the event loop for N seconds and uploads the stacks in collapsed (flamegraph) format.
+    (This command is for administrative use only and is not shown in the help command.)
+    """
+    seconds = max(1, min(seconds, profiling.PROFILE_MAX_SECONDS))
+    await ctx.send(f"🔬 Profiling the bot for {seconds}s...", delete_after=seconds)
+    try:
+        text, samples = await profiling.profile_loop(seconds)
+    except profiling.ProfilerBusy as e:
+        await ctx.send(str(e))
+        return
+    filename = f"scholarsync-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.collapsed"
+    await ctx.send(f"📈 {samples} samples over {seconds}s. Open with flamegraph.pl or speedscope.",
+                   file=discord.File(io.BytesIO(text.encode("utf-8")), filename=filename))
+
+# Alert messages per scheduler event: (flag, seconds left below which the alert is stale, message).
+EXPIRY_ALERTS = {
+    "alert_10": ("alerted_10", 300, "⏰ **Alert:** This group will end in **10 minutes**! Type **-extend** to extend the time."),
+    "alert_5": ("alerted_5", 60, "⏰ **Alert:** This group will end in **5 minutes**! Type **-extend** to extend the time."),
+    "alert_1": ("alerted_1", 0, "⏰ **Alert:** This group will end in **1 minute**! Type **-extend** to extend the time."),
+}
+
+async def check_expiry(guild_id: int, group_id: int, event: str):
+    """Handles one scheduled alert or expiry for a group, fired by the expiry scheduler."""
+    group = registry.get(guild_id, group_id)
+    if group is None:
+        return
+    if event == "expire":
+        await expire_group(guild_id, group_id)
+        return
+
+    flag, stale_below, alert_text = EXPIRY_ALERTS[event]
+    time_left = (group.expire_at - datetime.datetime.utcnow()).total_seconds()
+    if getattr(group, flag) or time_left <= stale_below:
+        return
+    channel = bot.get_channel(group.channel) if group.channel else None
+    if channel:
+        await channel.send(alert_text)
+    setattr(group, flag, True)
+    group_store.save_group(group)
+
+async def expire_group(guild_id: int, group_id: int):
+    """Deletes an expired group's channels and frees its members."""
+    group = registry.get(guild_id, group_id)
+    if group is None:
+        return
+    registry.remove(group)
+    group_store.delete_group(group)
+    guild = bot.get_guild(guild_id)
+    # Each chain runs in order; the teardown pipeline runs chains (and other expiring groups) concurrently.
+    # The #general notice goes through the announcement digest instead.
+    chains = []
+    channel = bot.get_channel(group.channel) if group.channel else None
+    if channel:
+        chains.append([send_step(channel, "🗑️ This study group has now ended."), delete_step(channel)])
+    voice_channel = bot.get_channel(group.voice_channel) if group.voice_channel else None
+    if voice_channel:
+        chains.append([delete_step(voice_channel)])
+    if guild and not group.secret:
+        general = get_general_channel(guild)
+        announcer.announce(general, f"🗑️ **Group Deleted:** ID **{group_id}** - **{group.subject}** has been deleted as per the set time.")
+    teardown_pipeline.submit(chains)
+
+expiry_scheduler = ExpiryScheduler(check_expiry)
+
+# ----------------- Metrics -----------------
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+@bot.after_invoke
+async def record_command_time(ctx):
+    # after_invoke runs for failed commands too; prompts the user answers slowly count towards the time.
+    status = "error" if ctx.command_failed else "ok"
+    metrics.command_seconds.observe(time.perf_counter() - ctx.started_at, command=ctx.command.qualified_name, status=status)
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    metrics.command_seconds.observe(elapsed, command=f"/{command.qualified_name}", status="ok")
+
+def cache_lookups(cache, counters: tuple) -> dict:
+    stats = cache.stats()
+    return {(counter,): stats[counter] for counter in counters}
+
+def group_counts() -> dict:
+    stats = registry.stats()
+    return {(kind,): stats[kind] for kind in ("groups", "public", "secret", "open")}
+
+metrics.Gauge("scholarsync_groups", "Study groups currently registered.", group_counts, ("kind",))
+metrics.Gauge("scholarsync_jobs", "PDF/AI jobs by state.",
+              lambda: {("queued",): job_scheduler.queued, ("running",): job_scheduler.running}, ("state",))
+metrics.Gauge("scholarsync_expiry_scheduled_groups", "Groups with pending alerts or expiry.", lambda: len(expiry_scheduler))
+metrics.Gauge("scholarsync_teardown_pending_chains", "Teardown chains waiting for the next batch.", lambda: teardown_pipeline.pending)
+metrics.Gauge("scholarsync_teardown_retrying", "Failed channel deletes waiting to be tried again.", lambda: teardown_pipeline.retrying)
+metrics.Gauge("scholarsync_group_store_pending_writes", "Group changes buffered for the next flush.", lambda: group_store.pending)
+metrics.Gauge("scholarsync_pdf_text_cache_lookups", "Extracted-text cache lookups by result, since start.",
+              lambda: cache_lookups(pdf_text_cache, ("hits", "disk_hits", "misses")), ("result",))
+metrics.Gauge("scholarsync_pdf_text_cache_bytes", "Extracted text held in memory.", lambda: pdf_text_cache.stats()["bytes"])
+metrics.Gauge("scholarsync_ai_result_cache_requests", "AI result cache requests by result (shared = joined one in flight), since start.",
+              lambda: cache_lookups(result_cache, ("hits", "misses", "shared")), ("result",))
+metrics.Gauge("scholarsync_gateway_latency_seconds", "Heartbeat latency per shard.",
+              lambda: {(str(shard_id),): latency for shard_id, latency in bot.latencies if latency == latency}, ("shard",))
+# -------------------------------------------
+
+async def main():
+    async with bot:
+        health = await keep_alive(bot, registry)
+        try:
+            await bot.start(os.getenv("TOKEN"))
+        finally:
+            await health.cleanup()
+            await ai_client.close()
+            await close_download_session()
+
+if __name__ == "__main__":
+    discord.utils.setup_logging()  # what bot.run would set up
+    try:
+        asyncio.run(main())
+    except discord.errors.HTTPException as e:
+        print(f"Failed to connect to Discord: {e}")
+        print("Please check your bot token and internet connection")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_pool()
+        group_store.close()
\ No newline at end of file
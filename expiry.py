@@ -0,0 +1,93 @@
+import time
+import heapq
+import asyncio
+import datetime
+
+from metrics import expiry_handler_seconds
+
+# (event name, seconds before expiry, minimum group duration for the event to apply)
+ALERTS = (("alert_10", 600, 600), ("alert_5", 300, 300), ("alert_1", 60, 0))
+EXPIRE = "expire"
+
+
+def _timestamp(moment: datetime.datetime) -> float:
+    # Group times are naive UTC datetimes.
+    return moment.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class ExpiryScheduler:
+    """Fires each group's alerts and expiry at their exact time from a min-heap of deadlines.
+
+    Rescheduling a group bumps its generation; entries from older generations are skipped when popped
+    (lazy invalidation), so -extend costs O(log n) and nothing runs between deadlines.
+    """
+    def __init__(self, handler):
+        self.handler = handler  # coroutine function (guild_id, group_id, event)
+        self._heap = []         # (deadline, sequence, (guild_id, group_id), generation, event)
+        self._generations = {}  # (guild_id, group_id) -> current generation
+        self._sequence = 0
+        self._wakeup = asyncio.Event()
+        self._tasks = set()
+        self.fired = 0
+
+    def __len__(self):
+        return len(self._generations)
+
+    def schedule(self, group):
+        """(Re)schedule every pending alert and the expiry for a group."""
+        group_key = (group.guild_id, group.group_id)
+        generation = self._generations.get(group_key, 0) + 1
+        self._generations[group_key] = generation
+        expire_ts = _timestamp(group.expire_at)
+        total_duration = (group.expire_at - group.created_at).total_seconds()
+        earliest = self._heap[0][0] if self._heap else None
+        for event, before, min_duration in ALERTS:
+            if total_duration >= min_duration:
+                self._push(expire_ts - before, group_key, generation, event)
+        self._push(expire_ts, group_key, generation, EXPIRE)
+        if earliest is None or self._heap[0][0] < earliest:
+            self._wakeup.set()
+        self._compact()
+
+    def _push(self, deadline: float, group_key: tuple, generation: int, event: str):
+        self._sequence += 1
+        heapq.heappush(self._heap, (deadline, self._sequence, group_key, generation, event))
+
+    def _compact(self):
+        # Stale entries are normally dropped as they surface; rebuild only if they dominate the heap.
+        if len(self._heap) > 8 * len(self._generations) + 64:
+            self._heap = [entry for entry in self._heap if self._generations.get(entry[2]) == entry[3]]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, group_key, generation, event = heapq.heappop(self._heap)
+            if self._generations.get(group_key) != generation:
+                continue
+            if event == EXPIRE:
+                self._generations.pop(group_key, None)
+            due.append((group_key, event))
+        return due
+
+    async def run(self):
+        """Sleep until the next deadline, fire everything due, repeat."""
+        while True:
+            for group_key, event in self._pop_due(time.time()):
+                self.fired += 1
+                task = asyncio.create_task(self._fire(group_key, event))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, group_key: tuple, event: str):
+        try:
+            with expiry_handler_seconds.time(event=event):
+                await self.handler(*group_key, event)
+        except Exception as e:
+            print(f"Expiry event {event} for group {group_key} failed: {e!r}")
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import datetime
+import threading
+
+from registry import Group
+
+# Study groups are persisted to SQLite so a restart doesn't lose them (or orphan their channels).
+GROUP_DB_PATH = os.getenv("GROUP_DB_PATH", "scholarsync.db")
+GROUP_FLUSH_INTERVAL = float(os.getenv("GROUP_FLUSH_INTERVAL", "0.5"))  # seconds mutations are buffered
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    guild_id      INTEGER NOT NULL,
+    group_id      INTEGER NOT NULL,
+    subject       TEXT NOT NULL,
+    max_members   INTEGER NOT NULL,
+    created_by    TEXT NOT NULL,
+    created_at    TEXT NOT NULL,
+    expire_at     TEXT NOT NULL,
+    members       TEXT NOT NULL,
+    channel       INTEGER,
+    voice_channel INTEGER,
+    alerted_10    INTEGER NOT NULL DEFAULT 0,
+    alerted_5     INTEGER NOT NULL DEFAULT 0,
+    alerted_1     INTEGER NOT NULL DEFAULT 0,
+    secret        INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, group_id)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_GROUP_COLUMNS = ("guild_id", "group_id", "subject", "max_members", "created_by", "created_at", "expire_at",
+                  "members", "channel", "voice_channel", "alerted_10", "alerted_5", "alerted_1", "secret")
+_UPSERT_GROUP = (f"INSERT OR REPLACE INTO groups ({', '.join(_GROUP_COLUMNS)}) "
+                 f"VALUES ({', '.join('?' for _ in _GROUP_COLUMNS)})")
+
+
+def _group_row(group: Group) -> tuple:
+    return (
+        group.guild_id, group.group_id, group.subject, group.max_members, group.created_by,
+        group.created_at.isoformat(), group.expire_at.isoformat(), json.dumps(sorted(group.members)),
+        group.channel, group.voice_channel, int(group.alerted_10), int(group.alerted_5),
+        int(group.alerted_1), int(group.secret),
+    )
+
+
+def _row_group(row: sqlite3.Row) -> Group:
+    return Group(
+        guild_id=row["guild_id"],
+        group_id=row["group_id"],
+        subject=row["subject"],
+        max_members=row["max_members"],
+        created_by=row["created_by"],
+        created_at=datetime.datetime.fromisoformat(row["created_at"]),
+        expire_at=datetime.datetime.fromisoformat(row["expire_at"]),
+        members=json.loads(row["members"]),
+        channel=row["channel"],
+        voice_channel=row["voice_channel"],
+        alerted_10=bool(row["alerted_10"]),
+        alerted_5=bool(row["alerted_5"]),
+        alerted_1=bool(row["alerted_1"]),
+        secret=bool(row["secret"]),
+    )
+
+
+class GroupStore:
+    """SQLite (WAL) persistence for study groups with a write-behind buffer.
+
+    Mutations only record which groups changed; a background flush writes the latest state of every
+    changed group in one transaction, so command handlers never wait on disk.
+    """
+    def __init__(self, path: str = GROUP_DB_PATH, flush_interval: float = GROUP_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._db_lock = threading.Lock()  # the flush thread and a final synchronous flush never overlap
+        self._pending_groups = {}         # (guild_id, group_id) -> group to write, or None to delete
+        self._pending_meta = {}
+        self._flush_task = None
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def pending(self) -> int:
+        """Buffered changes not yet written."""
+        return len(self._pending_groups) + len(self._pending_meta)
+
+    def load(self, registry):
+        """Read every group into a GroupRegistry at startup, along with each guild's next group ID."""
+        for row in self._conn.execute("SELECT * FROM groups"):
+            registry.add(_row_group(row))
+        for row in self._conn.execute("SELECT key, value FROM meta WHERE key LIKE 'group_counter:%'"):
+            registry.set_next_id(int(row["key"].split(":", 1)[1]), int(row["value"]))
+        return registry
+
+    def save_group(self, group: Group):
+        """Record that a group was created or changed."""
+        self._pending_groups[(group.guild_id, group.group_id)] = group
+        self._schedule_flush()
+
+    def delete_group(self, group: Group):
+        """Record that a group was removed."""
+        self._pending_groups[(group.guild_id, group.group_id)] = None
+        self._schedule_flush()
+
+    def set_counter(self, guild_id: int, group_counter: int):
+        """Record the next group ID to hand out in a guild."""
+        self._pending_meta[f"group_counter:{guild_id}"] = str(group_counter)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # no event loop (scripts, shutdown): write immediately
+            return
+        self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Keep going until nothing is buffered, so changes made during a flush are picked up by the next one.
+        while self._pending_groups or self._pending_meta:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush, *self._take_pending())
+
+    def _take_pending(self):
+        # Serialize on the loop thread so the flush thread never reads dicts that are being mutated.
+        groups = [(key, _group_row(group) if group is not None else None) for key, group in self._pending_groups.items()]
+        meta = list(self._pending_meta.items())
+        self._pending_groups = {}
+        self._pending_meta = {}
+        return groups, meta
+
+    def flush(self, groups=None, meta=None):
+        """Write buffered changes in a single transaction."""
+        if groups is None and meta is None:
+            groups, meta = self._take_pending()
+        if not groups and not meta:
+            return
+        started = time.perf_counter()
+        with self._db_lock, self._conn:
+            for (guild_id, group_id), row in groups:
+                if row is None:
+                    self._conn.execute("DELETE FROM groups WHERE guild_id = ? AND group_id = ?", (guild_id, group_id))
+                else:
+                    self._conn.execute(_UPSERT_GROUP, row)
+            self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta)
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - started
+
+    def close(self):
+        """Flush anything still buffered and close the database."""
+        self.flush()
+        self._conn.close()
+
+
+group_store = GroupStore()
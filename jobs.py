@@ -0,0 +1,131 @@
+import os
+import asyncio
+from collections import OrderedDict, deque
+
+import discord
+
+# PDF/AI work runs on a fixed set of workers, taking turns between guilds and, within a guild, between users.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))   # jobs waiting across all users
+JOB_MAX_PER_USER = int(os.getenv("JOB_MAX_PER_USER", "3"))  # jobs one user may have waiting
+
+
+class QueueFull(Exception):
+    """Raised when a job cannot be queued; the message is suitable to show the user."""
+
+
+class Job:
+    """One unit of queued work plus the Discord message that reports its progress."""
+    __slots__ = ("user_id", "guild_id", "run", "status_message", "kind", "_status_lock")
+
+    def __init__(self, user_id: int, guild_id: int, run, status_message: discord.Message = None, kind: str = "PDF"):
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.run = run  # coroutine function taking the job
+        self.status_message = status_message
+        self.kind = kind  # what the job is, in user-facing messages: "PDF", "summary", "question"...
+        self._status_lock = asyncio.Lock()  # keeps edits in the order they were requested
+
+    async def set_status(self, content: str, **kwargs):
+        """Edit the status message; failures (deleted message, missing perms) are ignored."""
+        if self.status_message is None:
+            return
+        async with self._status_lock:
+            try:
+                await self.status_message.edit(content=content, **kwargs)
+            except discord.HTTPException:
+                pass
+
+
+class JobScheduler:
+    """Bounded job queue served round-robin per guild, then per user."""
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_SIZE,
+                 max_per_user: int = JOB_MAX_PER_USER):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_per_user = max_per_user
+        self._guilds = OrderedDict()  # guild_id -> OrderedDict(user_id -> deque of jobs); front is served next
+        self._queued = 0
+        self._running = 0
+        self._available = None
+        self._tasks = []
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def submit(self, job: Job) -> int:
+        """Queue a job and return how many jobs are waiting ahead of it (0 = starts next)."""
+        users = self._guilds.get(job.guild_id)
+        pending = users.get(job.user_id) if users else None
+        if self._queued >= self.max_queued:
+            raise QueueFull(f"The bot is busy right now ({self._queued} jobs waiting). Please try again in a minute.")
+        if pending is not None and len(pending) >= self.max_per_user:
+            raise QueueFull(f"You already have {len(pending)} requests waiting, so this {job.kind} wasn't queued. "
+                            "Please wait for them to finish.")
+
+        self._start()
+        ahead = self._position(job.guild_id, job.user_id, len(pending) if pending else 0)
+        if users is None:
+            users = self._guilds[job.guild_id] = OrderedDict()
+        if pending is None:
+            pending = users[job.user_id] = deque()
+        pending.append(job)
+        self._queued += 1
+        self._available.release()
+        return ahead
+
+    def _position(self, guild_id: int, user_id: int, own_jobs: int) -> int:
+        # Under round-robin, a job waits for one turn of every queue with at least as many jobs as are ahead of it.
+        ahead = 0
+        for other_guild, users in self._guilds.items():
+            for other_user, pending in users.items():
+                if other_guild == guild_id and other_user == user_id:
+                    ahead += own_jobs
+                else:
+                    ahead += min(len(pending), own_jobs + 1)
+        return ahead
+
+    def _next_job(self) -> Job:
+        guild_id, users = self._guilds.popitem(last=False)
+        user_id, pending = users.popitem(last=False)
+        job = pending.popleft()
+        if pending:
+            users[user_id] = pending
+        if users:
+            self._guilds[guild_id] = users
+        self._queued -= 1
+        return job
+
+    def _start(self):
+        if self._tasks:
+            return
+        self._available = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            await self._available.acquire()
+            job = self._next_job()
+            self._running += 1
+            try:
+                await job.run(job)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise  # the worker itself is being stopped
+                # A CancelledError that escaped the job (e.g. from a cancelled task it awaited) must not
+                # take a worker down with it.
+                print(f"Job for user {job.user_id} was cancelled")
+                await job.set_status(f"❌ Something went wrong while processing this {job.kind}.", view=None)
+            except Exception as e:
+                print(f"Job for user {job.user_id} failed: {e!r}")
+                await job.set_status(f"❌ Something went wrong while processing this {job.kind}.", view=None)
+            finally:
+                self._running -= 1
+
+
+job_scheduler = JobScheduler()
@@ -1,16 +1,100 @@
-from flask import Flask
-from threading import Thread
+import os
+import math
+import asyncio
+from aiohttp import web
+import metrics
+from jobs import job_scheduler
+import profiling
 
-app = Flask(__name__)
+# Health server on the bot's own event loop. /livez answers as long as the loop does; /readyz also
+# needs every shard connected with a sane heartbeat and a loop that isn't falling behind.
+HEALTH_HOST = os.getenv("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", os.getenv("PORT", "5000")))
+HEALTH_MAX_LATENCY = float(os.getenv("HEALTH_MAX_LATENCY", "5"))     # seconds of heartbeat latency
+HEALTH_MAX_LOOP_LAG = float(os.getenv("HEALTH_MAX_LOOP_LAG", "1"))   # seconds a callback may hold the loop
+LOOP_LAG_INTERVAL = 0.5  # seconds between loop lag samples
 
-@app.route('/')
-def home():
-    return "Bot is alive and running!"
+class LoopLagMonitor:
+    """Samples how late a periodic sleep wakes up, i.e. how long callbacks are holding the loop."""
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.lag = 0.0       # lateness of the last tick, seconds
+        self.max_lag = 0.0   # worst lateness since start
+        self._task = None
 
-def run():
-    app.run(host='0.0.0.0', port=5000)
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
 
-def keep_alive():
-    server = Thread(target=run)
-    server.daemon = True  # This ensures the thread will close when the main program ends
-    server.start()
\ No newline at end of file
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            profiling.watchdog.beat()  # this tick doubles as the stall watchdog's heartbeat
+            self.lag = max(0.0, loop.time() - expected)
+            self.max_lag = max(self.max_lag, self.lag)
+
+loop_lag = LoopLagMonitor()
+metrics.Gauge("scholarsync_event_loop_lag_seconds", "How late the last loop lag probe woke up.", lambda: loop_lag.lag)
+
+def readiness(bot) -> tuple:
+    """(ready, details): gateway connected on every shard, heartbeat below the limit, loop keeping up."""
+    problems = []
+    if bot.is_closed() or not bot.is_ready():
+        problems.append("gateway not ready")
+    shards = {}
+    for shard_id, latency in bot.latencies:
+        shards[str(shard_id)] = None if math.isnan(latency) or math.isinf(latency) else round(latency, 3)
+        if shards[str(shard_id)] is None:
+            problems.append(f"shard {shard_id} has no heartbeat")
+        elif latency > HEALTH_MAX_LATENCY:
+            problems.append(f"shard {shard_id} latency {latency:.1f}s")
+    if loop_lag.lag > HEALTH_MAX_LOOP_LAG:
+        problems.append(f"event loop lag {loop_lag.lag:.2f}s")
+    return not problems, {"problems": problems, "shard_latency": shards, "loop_lag": round(loop_lag.lag, 3)}
+
+def create_app(bot, registry) -> web.Application:
+    async def livez(request):
+        return web.Response(text="ok")
+
+    async def readyz(request):
+        ready, details = readiness(bot)
+        return web.json_response({"ready": ready, **details}, status=200 if ready else 503)
+
+    async def status(request):
+        # Only index sizes and counters are read, so this is cheap and needs no lock on the loop.
+        ready, details = readiness(bot)
+        return web.json_response({
+            "ready": ready,
+            **details,
+            "max_loop_lag": round(loop_lag.max_lag, 3),
+            "loop_stalls": profiling.watchdog.stalls,
+            "slow_callbacks": list(profiling.slow_callbacks.recent),
+            "guilds": len(bot.guilds),
+            "groups": registry.stats(),
+            "jobs": {"queued": job_scheduler.queued, "running": job_scheduler.running,
+                     "max_queued": job_scheduler.max_queued, "workers": job_scheduler.workers},
+        })
+
+    async def metrics_endpoint(request):
+        return web.Response(body=metrics.registry.render().encode("utf-8"),
+                            headers={"Content-Type": metrics.CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/", livez)
+    app.router.add_get("/livez", livez)
+    app.router.add_get("/readyz", readyz)
+    app.router.add_get("/status", status)
+    app.router.add_get("/metrics", metrics_endpoint)
+    return app
+
+async def keep_alive(bot, registry) -> web.AppRunner:
+    """Start the health server, the loop lag probe and the stall watchdog; cleanup() the runner to stop."""
+    loop_lag.start()
+    profiling.start_diagnostics(loop_lag.interval)
+    runner = web.AppRunner(create_app(bot, registry), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, HEALTH_HOST, HEALTH_PORT).start()
+    print(f"Health server listening on {HEALTH_HOST}:{HEALTH_PORT}")
+    return runner
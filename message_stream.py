@@ -0,0 +1,131 @@
+import io
+import os
+import asyncio
+
+import discord
+
+# Progressive delivery of long bot output: text is fed in as it arrives and a background task edits it
+# into Discord at most once per STREAM_EDIT_INTERVAL, rolling over into new messages at the length limit.
+DISCORD_MESSAGE_LIMIT = 2000
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))  # seconds between edits
+STREAM_MAX_MESSAGES = int(os.getenv("STREAM_MAX_MESSAGES", "5"))        # beyond this, attach a text file
+
+
+def split_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> list:
+    """Split text into pages of at most limit characters, preferring line then word boundaries.
+
+    A page's boundary depends only on the text before it, so pages stay put while text is appended.
+    """
+    pages = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut < limit // 2:
+            cut = text.rfind(" ", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        pages.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    pages.append(text)
+    return pages
+
+
+class MessageStream:
+    """Output that grows in place in a channel or DM.
+
+    feed() is synchronous and cheap, so the producer never waits on Discord; finish() writes the
+    authoritative final text. If it needs more than max_messages pages, the full text is attached as
+    a file after the pages already shown. A send that fails (e.g. closed DMs) is kept in `error` and
+    stops further output. The text is model output (and may quote users), so by default it pings no one.
+    """
+    def __init__(self, destination: discord.abc.Messageable, header: str = "", filename: str = "output.txt",
+                 interval: float = STREAM_EDIT_INTERVAL, max_messages: int = STREAM_MAX_MESSAGES,
+                 allowed_mentions: discord.AllowedMentions = None):
+        self.destination = destination
+        self.allowed_mentions = allowed_mentions or discord.AllowedMentions.none()
+        self.header = header
+        self.filename = filename
+        self.interval = interval
+        self.max_messages = max_messages
+        self.body = ""
+        self.error = None
+        self._messages = []   # (message, content) for every page sent so far
+        self._changed = asyncio.Event()
+        self._task = None
+        self._rendering = None  # the pump's current render; stopping the pump never interrupts one
+
+    def feed(self, text: str):
+        """Append text; it shows up at the next throttled edit."""
+        if not text or self.error is not None:
+            return
+        self.body += text
+        self._changed.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._pump())
+
+    async def _pump(self):
+        while self.error is None:
+            await self._changed.wait()
+            self._changed.clear()
+            self._rendering = asyncio.ensure_future(
+                self._render(split_message(self.header + self.body.strip())[: self.max_messages]))
+            await asyncio.shield(self._rendering)
+            await asyncio.sleep(self.interval)
+
+    async def _render(self, pages: list):
+        """Bring the sent messages in line with pages, editing only the ones that changed."""
+        try:
+            for index, content in enumerate(pages):
+                if not content:
+                    continue
+                if index < len(self._messages):
+                    message, shown = self._messages[index]
+                    if shown != content:
+                        await message.edit(content=content, allowed_mentions=self.allowed_mentions)
+                        self._messages[index] = (message, content)
+                else:
+                    sent = await self.destination.send(content, allowed_mentions=self.allowed_mentions)
+                    self._messages.append((sent, content))
+        except discord.HTTPException as e:
+            self.error = e
+
+    async def _stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._rendering is not None:
+            await self._rendering
+
+    async def abort(self, note: str):
+        """Stop streaming; if part of the output is already showing, follow it with note."""
+        await self._stop()
+        if self._messages and self.error is None:
+            try:
+                await self.destination.send(note, allowed_mentions=self.allowed_mentions)
+            except discord.HTTPException:
+                pass
+
+    async def finish(self, text: str = None) -> bool:
+        """Show the final text (or what was fed) and return whether it was delivered."""
+        await self._stop()
+        if text is not None:
+            self.body = text
+        if self.error is not None:
+            return False
+
+        pages = split_message(self.header + self.body.strip())
+        if len(pages) <= self.max_messages:
+            await self._render(pages)
+            return self.error is None
+
+        await self._render(pages[: self.max_messages])
+        if self.error is None:
+            try:
+                attachment = discord.File(io.BytesIO(self.body.strip().encode("utf-8")), filename=self.filename)
+                await self.destination.send("📎 That was long, so the full text is attached.", file=attachment,
+                                            allowed_mentions=self.allowed_mentions)
+            except discord.HTTPException as e:
+                self.error = e
+        return self.error is None
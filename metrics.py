@@ -0,0 +1,167 @@
+import time
+import bisect
+import logging
+
+# Prometheus-format metrics, served by keep_alive at /metrics. Kept dependency-free: counters, gauges
+# and histograms are plain dicts keyed by label values, rendered in the text exposition format.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+                for key, value in list(self._values.items())]
+
+
+class Gauge(_Metric):
+    """A value read at scrape time from callback(), which returns a number or {label values tuple: number}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> list:
+        value = self.callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(number)}" for key, number in value.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts = self._values.get(key)
+        if counts is None:
+            counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager observing the duration of its body (works in async code too)."""
+        return _Timer(self, labels)
+
+    def samples(self) -> list:
+        lines = []
+        for key, counts in list(self._values.items()):
+            counts = list(counts)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text format; a gauge whose callback fails is skipped."""
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                print(f"Metric {metric.name} could not be collected: {e!r}")
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+command_seconds = Histogram("scholarsync_command_seconds", "Time to handle a command.", ("command", "status"))
+pdf_stage_seconds = Histogram("scholarsync_pdf_stage_seconds", "Time spent in each PDF processing stage.", ("stage",))
+expiry_handler_seconds = Histogram("scholarsync_expiry_handler_seconds", "Time to handle one group alert or expiry.",
+                                   ("event",), buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+ai_speculations = Counter("scholarsync_ai_speculations_total",
+                          "Speculative AI calls by outcome (started, used, cancelled).", ("outcome",))
+discord_rate_limits = Counter("scholarsync_discord_rate_limits_total", "Discord 429 responses.")
+discord_global_rate_limits = Counter("scholarsync_discord_global_rate_limits_total", "Discord global rate limit hits.")
+
+
+class _RateLimitCounter(logging.Handler):
+    """Counts the 429s discord.py logs (it retries them itself, so they never reach the bot's code)."""
+    def emit(self, record: logging.LogRecord):
+        message = str(record.msg)
+        if "responded with 429" in message:
+            discord_rate_limits.inc()
+        elif message.startswith("Global rate limit has been hit"):
+            discord_global_rate_limits.inc()
+
+
+logging.getLogger("discord.http").addHandler(_RateLimitCounter(logging.WARNING))
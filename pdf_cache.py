@@ -0,0 +1,173 @@
+import os
+import zlib
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+# Extracted text is cached by the SHA-256 of the PDF bytes, so a reposted handout is never parsed twice.
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR")  # Unset disables the on-disk tier.
+PDF_CACHE_DISK_MAX_BYTES = int(os.getenv("PDF_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))  # 0 = no limit
+PDF_CACHE_MAX_SOURCES = 10000  # (url, size) pre-check entries kept
+
+
+def content_hash(pdf_bytes: bytes) -> str:
+    """Return the cache key for a PDF's raw bytes."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def text_key(digest: str, pages: str = "", version: str = "") -> str:
+    """Cache key for the text of some pages of a PDF ("" = the whole document), extracted with settings `version`."""
+    key = f"{digest}-p{pages.replace(',', '_')}" if pages else digest
+    return f"{key}-{version}" if version else key
+
+
+class PdfTextCache:
+    """Two-tier (memory LRU + compressed disk) cache of extracted PDF text."""
+    def __init__(self, max_bytes: int = PDF_CACHE_MAX_BYTES, cache_dir: str = None,
+                 disk_max_bytes: int = PDF_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.current_bytes = 0
+        self.disk_bytes = None          # size of the disk tier, measured on the first write
+        self._entries = OrderedDict()   # digest -> text, least recently used first
+        self._sources = {}              # (url, size, pages) -> key, lets a known attachment skip the download
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    async def lookup_attachment(self, url: str, size: int, pages: str = ""):
+        """Cheap pre-check: return (key, text) for an attachment (and page range) seen before, or None."""
+        digest = self._sources.get((url, size, pages))
+        if digest is None:
+            return None
+        text = await self.get(digest)
+        if text is None:
+            return None
+        return digest, text
+
+    async def get(self, digest: str):
+        """Return the cached text for a digest, or None on a miss."""
+        text = self._entries.get(digest)
+        if text is not None:
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return text
+        text = await asyncio.to_thread(self._read_disk, digest) if self.cache_dir else None
+        if text is not None:
+            self.disk_hits += 1
+            self._remember(digest, text)
+            return text
+        self.misses += 1
+        return None
+
+    async def put(self, digest: str, text: str, url: str = None, size: int = None, pages: str = ""):
+        """Store extracted text under its key (and its attachment url/size/page range if given)."""
+        if url is not None and size is not None:
+            self._sources[(url, size, pages)] = digest
+            if len(self._sources) > PDF_CACHE_MAX_SOURCES:
+                self._sources.pop(next(iter(self._sources)))
+        if digest in self._entries:
+            self._entries.move_to_end(digest)
+            return
+        self._remember(digest, text)
+        if self.cache_dir:
+            await asyncio.to_thread(self._write_disk, digest, text)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current memory usage."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
+
+    def _remember(self, digest: str, text: str):
+        size = _text_size(text)
+        if size > self.max_bytes:
+            return
+        self._entries[digest] = text
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            old_digest, old_text = self._entries.popitem(last=False)
+            self.current_bytes -= _text_size(old_text)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.txt.z")
+
+    def _read_disk(self, digest: str):
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                text = zlib.decompress(f.read()).decode("utf-8")
+            os.utime(path)  # eviction goes by mtime, so a read keeps the file
+            return text
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+
+    def _write_disk(self, digest: str, text: str):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.tmp"
+        data = zlib.compress(text.encode("utf-8"), 6)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"PDF cache: could not write {path}: {e}")
+            return
+        if not self.disk_max_bytes:
+            return
+        if self.disk_bytes is None:
+            self._trim_disk()
+        else:
+            self.disk_bytes += len(data)
+            if self.disk_bytes > self.disk_max_bytes:
+                self._trim_disk()
+
+    def _trim_disk(self):
+        """Delete the least recently used files until the disk tier is under 90% of disk_max_bytes.
+
+        The headroom means the directory is rescanned every so often rather than on every write.
+        """
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".txt.z"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 0.9 if total > self.disk_max_bytes else self.disk_max_bytes
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        self.disk_bytes = total
+        if evicted:
+            print(f"PDF cache: evicted {evicted} files from disk, {total // (1024 * 1024)} MB left")
+
+
+def _text_size(text: str) -> int:
+    # Approximate in-memory size; exact accounting isn't needed for a budget.
+    return len(text) * (1 if text.isascii() else 4)
+
+
+pdf_text_cache = PdfTextCache(cache_dir=PDF_CACHE_DIR)
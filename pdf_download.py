@@ -0,0 +1,177 @@
+import os
+import re
+import asyncio
+import hashlib
+import tempfile
+
+import aiohttp
+
+# Uploads are streamed in chunks: small files stay in memory, larger ones spill to a temp file.
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(25 * 1024 * 1024)))
+PDF_SPOOL_MEMORY = int(os.getenv("PDF_SPOOL_MEMORY", str(4 * 1024 * 1024)))
+PDF_PAGE_LIMIT = int(os.getenv("PDF_PAGE_LIMIT", "0"))  # 0 disables the page-count gate
+PDF_CONTENT_TYPES = ("application/pdf", "application/x-pdf", "application/octet-stream")
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PAGE_COUNT_WINDOW = 8 * 1024  # bytes read from each end of the file when looking for the page count
+
+_LINEARIZED_PAGES = re.compile(rb"/Linearized\b.*?/N\s+(\d+)", re.DOTALL)
+_PAGES_DICT = re.compile(rb"<<(?:(?!>>).)*?/Type\s*/Pages\b(?:(?!>>).)*?>>", re.DOTALL)
+_COUNT = re.compile(rb"/Count\s+(\d+)")
+
+_session = None
+
+
+class PdfRejected(Exception):
+    """Raised when an upload fails a size, type or page-count check; the message is shown to the user."""
+
+
+def check_attachment(attachment) -> None:
+    """Reject attachments by metadata alone, before anything is downloaded."""
+    if attachment.size > PDF_MAX_BYTES:
+        raise PdfRejected(f"That PDF is too large ({attachment.size // (1024 * 1024)} MB). "
+                          f"The limit is {PDF_MAX_BYTES // (1024 * 1024)} MB.")
+    content_type = (attachment.content_type or "").split(";")[0].strip().lower()
+    if content_type and content_type not in PDF_CONTENT_TYPES:
+        raise PdfRejected("That file doesn't look like a PDF.")
+
+
+class DownloadedPdf:
+    """A downloaded PDF held in memory, or in a temp file once it outgrows PDF_SPOOL_MEMORY."""
+    def __init__(self):
+        self.size = 0
+        self.path = None
+        self._buffer = bytearray()
+        self._file = None
+        self._hash = hashlib.sha256()
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the content, computed while downloading."""
+        return self._hash.hexdigest()
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        self._hash.update(chunk)
+        if self._file is None and len(self._buffer) + len(chunk) > PDF_SPOOL_MEMORY:
+            self._file = tempfile.NamedTemporaryFile(prefix="scholarsync-", suffix=".pdf", delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer += chunk
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+
+    def source(self):
+        """What the extractor should open: the bytes themselves or the temp file path."""
+        return bytes(self._buffer) if self.path is None else self.path
+
+    def head_and_tail(self, window: int) -> bytes:
+        """First and last `window` bytes of the file, without reading the middle."""
+        if self.path is None:
+            data = self._buffer
+            return bytes(data[:window] + data[-window:]) if len(data) > 2 * window else bytes(data)
+        with open(self.path, "rb") as f:
+            head = f.read(window)
+            if self.size <= 2 * window:
+                return head + f.read()
+            f.seek(-window, os.SEEK_END)
+            return head + f.read()
+
+    def close(self):
+        """Delete the temp file, if any."""
+        self.finish()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def page_count(data: bytes):
+    """Best-effort page count from the linearization header or a page tree in data (a PDF's two ends), else None."""
+    match = _LINEARIZED_PAGES.search(data[:1024])
+    if match:
+        return int(match.group(1))
+    counts = [int(count) for pages in _PAGES_DICT.findall(data) for count in _COUNT.findall(pages)]
+    return max(counts) if counts else None
+
+
+def read_page_count(pdf: DownloadedPdf):
+    """Page count of a downloaded PDF, from the ends of the file."""
+    return page_count(pdf.head_and_tail(PAGE_COUNT_WINDOW))
+
+
+async def _fetch_range(url: str, byte_range: str):
+    """Bytes of url in byte_range (e.g. "0-8191", "-8192"), or None if the server sends the whole file instead."""
+    async with _get_session().get(url, headers={"Range": f"bytes={byte_range}"}) as response:
+        response.raise_for_status()
+        if response.status != 206:
+            return None  # range ignored; don't pull the whole body just to look at its ends
+        return await response.read()
+
+
+async def probe_page_count(attachment):
+    """Page count from the two ends of the attachment, fetched with Range requests, before downloading it.
+
+    None when it can't be told this way: small files (the full download is no bigger), servers that
+    ignore Range, failed requests, or no page count near either end.
+    """
+    if attachment.size <= 2 * PAGE_COUNT_WINDOW:
+        return None
+    try:
+        head, tail = await asyncio.gather(_fetch_range(attachment.url, f"0-{PAGE_COUNT_WINDOW - 1}"),
+                                          _fetch_range(attachment.url, f"-{PAGE_COUNT_WINDOW}"))
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    if head is None or tail is None:
+        return None
+    return page_count(head + tail)
+
+
+def check_page_count(pages):
+    if pages is not None and pages > PDF_PAGE_LIMIT:
+        raise PdfRejected(f"That PDF has {pages} pages. The limit is {PDF_PAGE_LIMIT}.")
+
+
+def _get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=120))
+    return _session
+
+
+async def close_session():
+    """Close the download session (used on bot shutdown)."""
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+
+async def download_pdf(attachment) -> DownloadedPdf:
+    """Stream an attachment to a DownloadedPdf, enforcing the size and page limits.
+
+    With PDF_PAGE_LIMIT set, the page count is read from the file's ends first, so an oversized document
+    is usually rejected without being downloaded; otherwise it is checked once the download is done.
+    """
+    probed = await probe_page_count(attachment) if PDF_PAGE_LIMIT else None
+    check_page_count(probed)
+    pdf = DownloadedPdf()
+    try:
+        async with _get_session().get(attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                pdf.write(chunk)
+                if pdf.size > PDF_MAX_BYTES:
+                    raise PdfRejected(f"That PDF is larger than {PDF_MAX_BYTES // (1024 * 1024)} MB.")
+        pdf.finish()
+        if PDF_PAGE_LIMIT and probed is None:
+            check_page_count(read_page_count(pdf))
+    except BaseException:
+        pdf.close()
+        raise
+    return pdf
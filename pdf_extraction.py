@@ -0,0 +1,291 @@
+import io
+import os
+import asyncio
+import multiprocessing
+import importlib.util
+
+import PyPDF2
+
+from text_processing import PAGE_BREAK, compact_text
+
+# Extraction runs in worker processes so a large PDF never blocks the gateway.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "30"))    # seconds per document
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "300"))  # pages extracted per document
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto")         # pypdf2, pdfium, pymupdf, pdfminer or auto
+PDF_COMPACT = os.getenv("PDF_COMPACT", "1") == "1"     # strip headers/footers and broken lines before prompting
+PDF_TOKEN_BUDGET = int(os.getenv("PDF_TOKEN_BUDGET", "100000"))  # tokens of text kept per document (0 = all)
+
+_pool = None
+
+
+class PdfExtractionError(Exception):
+    """Raised when a PDF cannot be parsed or takes too long to extract."""
+
+
+def parse_page_range(spec: str) -> tuple:
+    """Parse "3-7, 10" into ((3, 7), (10, 10)) (1-based, inclusive). Raises PdfExtractionError if malformed."""
+    ranges = []
+    for part in spec.replace(" ", "").split(","):
+        first, _, last = part.partition("-")
+        try:
+            start, end = int(first), int(last or first)
+        except ValueError:
+            raise PdfExtractionError(f"Invalid page range: {part or spec}") from None
+        if start < 1 or end < start:
+            raise PdfExtractionError(f"Invalid page range: {part}")
+        ranges.append((start, end))
+    if not ranges:
+        raise PdfExtractionError("Empty page range")
+    return tuple(ranges)
+
+
+def format_page_range(ranges: tuple) -> str:
+    """Canonical text for parsed ranges, e.g. "3-7,10" (also used in cache keys)."""
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def select_pages(page_count: int, ranges: tuple = None, max_pages: int = PDF_MAX_PAGES) -> list:
+    """0-based indices of the pages to extract: the ranges (or every page) in order, capped at max_pages."""
+    if not ranges:
+        return list(range(min(page_count, max_pages)))
+    indices, seen = [], set()
+    for start, end in ranges:
+        for index in range(start - 1, min(end, page_count)):
+            if index not in seen:
+                seen.add(index)
+                indices.append(index)
+    return indices[:max_pages]
+
+
+def _pypdf2_pages(source, ranges, max_pages: int):
+    reader = PyPDF2.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    for index in select_pages(len(reader.pages), ranges, max_pages):
+        yield reader.pages[index].extract_text()
+
+
+def _pdfium_pages(source, ranges, max_pages: int):
+    import pypdfium2
+    document = pypdfium2.PdfDocument(source)
+    try:
+        for index in select_pages(len(document), ranges, max_pages):
+            page = document[index]
+            text_page = page.get_textpage()
+            yield text_page.get_text_range().replace("\r\n", "\n")
+            text_page.close()
+            page.close()
+    finally:
+        document.close()
+
+
+def _pymupdf_pages(source, ranges, max_pages: int):
+    import pymupdf
+    document = pymupdf.open(stream=source, filetype="pdf") if isinstance(source, bytes) else pymupdf.open(source)
+    try:
+        for index in select_pages(document.page_count, ranges, max_pages):
+            yield document[index].get_text()
+    finally:
+        document.close()
+
+
+def _pdfminer_pages(source, ranges, max_pages: int):
+    # Layout analysis off (laparams=None): text comes out in content-stream order, several times faster.
+    from pdfminer.converter import TextConverter
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    file = io.BytesIO(source) if isinstance(source, bytes) else open(source, "rb")
+    try:
+        pages = list(PDFPage.get_pages(file))
+        resources = PDFResourceManager()
+        for index in select_pages(len(pages), ranges, max_pages):
+            output = io.StringIO()
+            converter = TextConverter(resources, output, laparams=None)
+            PDFPageInterpreter(resources, converter).process_page(pages[index])
+            converter.close()
+            yield output.getvalue()
+    finally:
+        file.close()
+
+
+# name -> (module that must be importable, page iterator)
+BACKENDS = {
+    "pypdf2": ("PyPDF2", _pypdf2_pages),
+    "pdfium": ("pypdfium2", _pdfium_pages),
+    "pymupdf": ("pymupdf", _pymupdf_pages),
+    "pdfminer": ("pdfminer", _pdfminer_pages),
+}
+# Best first by benchmarks/bench_extraction.py (pages/s at matching text); "auto" takes the first one that
+# is installed. Only PyPDF2 is in requirements.txt, so it is what auto picks unless an engine is added.
+# pdfminer comes last: even with layout analysis off it was over 10x slower and ran words together.
+BACKEND_PREFERENCE = ("pdfium", "pymupdf", "pypdf2", "pdfminer")
+
+
+def available_backends() -> list:
+    """Installed backends in preference order."""
+    return [name for name in BACKEND_PREFERENCE if importlib.util.find_spec(BACKENDS[name][0]) is not None]
+
+
+def resolve_backend(name: str = PDF_BACKEND) -> str:
+    """The backend to use for a configured name; an unknown or missing one falls back to auto."""
+    available = available_backends()
+    if name in available:
+        return name
+    if name != "auto":
+        print(f"PDF backend {name!r} is not available, using {available[0]!r} instead")
+    return available[0]
+
+
+def iter_page_text(source, max_pages: int, ranges: tuple = None, backend: str = "pypdf2"):
+    """Yield the text of each selected page in turn, stopping after max_pages pages."""
+    for page_text in BACKENDS[backend][1](source, ranges, max_pages):
+        if page_text:
+            yield page_text
+
+
+def extract_text(source, max_pages: int = PDF_MAX_PAGES, ranges: tuple = None, backend: str = "pypdf2") -> str:
+    """Extract the text of a PDF given as bytes or a file path, pages separated by PAGE_BREAK."""
+    return PAGE_BREAK.join(iter_page_text(source, max_pages, ranges, backend))
+
+
+def extract_compact_text(source, max_pages: int, ranges: tuple, backend: str, token_budget: int) -> tuple:
+    """extract_text followed by compact_text; runs inside a worker process and returns (text, stats)."""
+    return compact_text(extract_text(source, max_pages, ranges, backend), token_budget)
+
+
+_backend = None  # resolved on first use, in the bot process
+
+
+def _serve(conn):
+    """Worker process loop: run one (function, args) job at a time and send back (ok, result or message)."""
+    while True:
+        try:
+            function, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            reply = (True, function(*args))
+        except Exception as e:
+            reply = (False, str(e) or type(e).__name__)
+        conn.send(reply)
+
+
+class _Worker:
+    """One extraction process, fed over a pipe. call() blocks, so it is run in a thread."""
+    def __init__(self):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child,), name="pdf-worker", daemon=True)
+        self.process.start()
+        child.close()
+
+    def call(self, function, args: tuple):
+        self.conn.send((function, args))
+        return self.conn.recv()
+
+    def kill(self):
+        # The pipe is left for the thread still blocked in call() to see EOF on; it closes when dropped.
+        self.process.kill()
+        self.process.join(1)
+
+
+class WorkerPool:
+    """PDF_WORKERS long-lived worker processes, each running one job at a time.
+
+    A job only starts its clock once it has a worker to itself, so time spent waiting for one never counts
+    against its timeout. A job that times out (or whose worker dies) costs only its own worker, which is
+    killed and replaced on demand; the other jobs keep running.
+    """
+    def __init__(self, size: int = PDF_WORKERS):
+        self.size = size
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []        # workers waiting for a job
+        self._workers = set()  # every live worker, busy or idle
+
+    async def run(self, function, *args, timeout: float = PDF_TIMEOUT):
+        """function(*args) in a worker process; raises PdfExtractionError on failure or timeout."""
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else self._spawn()
+            try:
+                ok, result = await asyncio.wait_for(asyncio.to_thread(worker.call, function, args), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._discard(worker)
+                raise PdfExtractionError(f"PDF processing took longer than {timeout:.0f}s")
+            except (EOFError, OSError) as e:
+                self._discard(worker)
+                raise PdfExtractionError("The PDF worker crashed") from e
+            except BaseException:
+                self._discard(worker)  # cancelled mid-job: its reply would confuse the next job
+                raise
+            self._idle.append(worker)
+        if not ok:
+            raise PdfExtractionError(result)
+        return result
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker()
+        self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker: _Worker):
+        self._workers.discard(worker)
+        worker.kill()
+
+    def shutdown(self):
+        """Kill every worker (used on bot shutdown)."""
+        for worker in list(self._workers):
+            self._discard(worker)
+        self._idle.clear()
+
+
+def get_pool() -> WorkerPool:
+    """Return the shared extraction pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool()
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the extraction workers (used on bot shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+async def run_in_pool(function, *args, timeout: float = PDF_TIMEOUT):
+    """Run function(*args) in the extraction pool, raising PdfExtractionError on failure or timeout."""
+    return await get_pool().run(function, *args, timeout=timeout)
+
+
+def current_backend() -> str:
+    """The backend extraction uses in this process, resolved on first use."""
+    global _backend
+    if _backend is None:
+        _backend = resolve_backend()
+        print(f"Extracting PDF text with {_backend}")
+    return _backend
+
+
+def extraction_version(max_pages: int = PDF_MAX_PAGES) -> str:
+    """Tag for the settings that shape the extracted text; cache keys include it so changing them re-extracts."""
+    compaction = f"c{PDF_TOKEN_BUDGET}" if PDF_COMPACT else "raw"
+    return f"{current_backend()}-{compaction}-m{max_pages}"
+
+
+async def extract_text_async(source, timeout: float = PDF_TIMEOUT, max_pages: int = PDF_MAX_PAGES,
+                             ranges: tuple = None, name: str = "") -> str:
+    """Extract (and compact) PDF text, optionally only the given page ranges, in the process pool off the event loop.
+
+    name identifies the document in the log.
+    """
+    backend = current_backend()
+    if PDF_COMPACT:
+        result = await run_in_pool(extract_compact_text, source, max_pages, ranges, backend, PDF_TOKEN_BUDGET,
+                                   timeout=timeout)
+    else:
+        result = await run_in_pool(extract_text, source, max_pages, ranges, backend, timeout=timeout)
+    if not PDF_COMPACT:
+        return result
+    text, stats = result
+    print(f"PDF text compacted ({name or 'unnamed'}): {stats}")
+    return text
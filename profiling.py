@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter, deque
+import metrics
+
+# Stall diagnostics. A watchdog thread notices when the event loop stops ticking (it is fed by the loop
+# lag monitor's heartbeat, see keep_alive.LoopLagMonitor) and prints what the loop thread is running; the sampler records the loop thread's stacks for -profile; and with
+# ASYNCIO_DEBUG=1, asyncio's own slow-callback timings are collected for /status and /metrics.
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.5"))  # seconds without a tick
+WATCHDOG_INTERVAL = 0.1  # seconds between the watchdog thread's checks
+ASYNCIO_DEBUG = os.getenv("ASYNCIO_DEBUG", "0") == "1"
+SLOW_CALLBACK_SECONDS = float(os.getenv("SLOW_CALLBACK_SECONDS", "0.1"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between samples
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+slow_callback_seconds = metrics.Histogram("scholarsync_slow_callback_seconds",
+                                          "Loop callbacks slower than SLOW_CALLBACK_SECONDS (asyncio debug mode).")
+loop_stalls = metrics.Counter("scholarsync_loop_stalls_total", "Times the event loop stopped ticking for too long.")
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def collapse(frame) -> str:
+    """One stack in the collapsed format flamegraph tools read: root first, frames joined by ';'."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame).replace(";", ":"))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class LoopWatchdog:
+    """Thread that prints the loop thread's stack (and current task) once per stall.
+
+    It has no task of its own on the loop: whatever already ticks periodically calls beat().
+    """
+    def __init__(self, threshold: float = LOOP_STALL_THRESHOLD):
+        self.threshold = threshold
+        self.last_tick = time.monotonic()
+        self.beat_interval = WATCHDOG_INTERVAL
+        self.stalls = 0
+        self._loop = None
+        self._loop_thread = None
+        self._thread = None
+
+    def beat(self):
+        """Called from the loop at least every beat_interval seconds while it is healthy."""
+        self.last_tick = time.monotonic()
+
+    def start(self, loop: asyncio.AbstractEventLoop, beat_interval: float):
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self.beat_interval = beat_interval
+        self.last_tick = time.monotonic()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        reported = None
+        while True:
+            time.sleep(WATCHDOG_INTERVAL)
+            last_tick = self.last_tick
+            stalled_for = time.monotonic() - last_tick - self.beat_interval  # the beat's own sleep isn't a stall
+            if stalled_for < self.threshold:
+                if reported is not None:
+                    print(f"Event loop recovered after {time.monotonic() - reported - self.beat_interval:.2f}s")
+                reported = None
+                continue
+            if reported is not None:
+                continue
+            reported = last_tick
+            self.stalls += 1
+            loop_stalls.inc()
+            frame = sys._current_frames().get(self._loop_thread)
+            task = getattr(asyncio.tasks, "_current_tasks", {}).get(self._loop)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(no frame)\n"
+            print(f"Event loop stalled for {stalled_for:.2f}s in task {task!r}:\n{stack}", end="")
+
+watchdog = LoopWatchdog()
+
+class SlowCallbackLog(logging.Handler):
+    """Keeps the "Executing <handle> took N seconds" warnings asyncio's debug mode logs."""
+    def __init__(self, keep: int = 20):
+        super().__init__(logging.WARNING)
+        self.recent = deque(maxlen=keep)
+
+    def emit(self, record: logging.LogRecord):
+        if record.msg != "Executing %s took %.3f seconds" or not record.args:
+            return
+        handle, seconds = record.args
+        slow_callback_seconds.observe(seconds)
+        self.recent.append({"callback": str(handle)[:300], "seconds": round(seconds, 3), "at": record.created})
+
+slow_callbacks = SlowCallbackLog()
+
+def enable_asyncio_debug(loop: asyncio.AbstractEventLoop):
+    """Turn on asyncio debug mode so callbacks slower than SLOW_CALLBACK_SECONDS are timed."""
+    loop.set_debug(True)
+    loop.slow_callback_duration = SLOW_CALLBACK_SECONDS
+    logging.getLogger("asyncio").addHandler(slow_callbacks)
+
+def start_diagnostics(beat_interval: float):
+    """Start the watchdog (and debug mode if configured) for the running loop, fed every beat_interval seconds."""
+    loop = asyncio.get_running_loop()
+    watchdog.start(loop, beat_interval)
+    if ASYNCIO_DEBUG:
+        enable_asyncio_debug(loop)
+
+class ProfilerBusy(Exception):
+    pass
+
+_profile_lock = threading.Lock()
+
+def sample_stacks(thread_id: int, seconds: float, interval: float = PROFILE_INTERVAL) -> tuple:
+    """Sample one thread's stack for `seconds`; returns (collapsed-stack text, number of samples). Blocking."""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running.")
+    try:
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                stacks[collapse(frame)] += 1
+            del frame
+            time.sleep(interval)
+    finally:
+        _profile_lock.release()
+    text = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    return text, sum(stacks.values())
+
+async def profile_loop(seconds: float) -> tuple:
+    """Sample the event loop thread from a worker thread, so the profile sees whatever blocks the loop."""
+    return await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds)
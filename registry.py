@@ -0,0 +1,188 @@
+import bisect
+
+
+class Group:
+    """A study group. Mutate membership through GroupRegistry so its indexes stay current."""
+    __slots__ = ("guild_id", "group_id", "subject", "max_members", "created_by", "created_at", "expire_at",
+                 "members", "channel", "voice_channel", "alerted_10", "alerted_5", "alerted_1", "secret")
+
+    def __init__(self, guild_id: int, group_id: int, subject: str, max_members: int, created_by: str,
+                 created_at, expire_at, members=(), channel: int = None, voice_channel: int = None,
+                 alerted_10: bool = False, alerted_5: bool = False, alerted_1: bool = False, secret: bool = False):
+        self.guild_id = guild_id
+        self.group_id = group_id
+        self.subject = subject
+        self.max_members = max_members
+        self.created_by = created_by
+        self.created_at = created_at
+        self.expire_at = expire_at
+        self.members = set(members)
+        self.channel = channel
+        self.voice_channel = voice_channel
+        self.alerted_10 = alerted_10
+        self.alerted_5 = alerted_5
+        self.alerted_1 = alerted_1
+        self.secret = secret
+
+    @property
+    def member_count(self) -> str:
+        """Members as shown to users, e.g. "3/5"."""
+        return f"{len(self.members)}/{self.max_members}"
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.members) >= self.max_members
+
+
+class _GuildIndex:
+    """Per-guild indexes over that guild's groups."""
+    __slots__ = ("groups", "public", "secret", "open", "subjects", "user_groups", "next_id")
+
+    def __init__(self):
+        self.groups = {}       # group_id -> Group, in creation order
+        self.public = {}       # group_id -> Group for non-secret groups
+        self.secret = {}       # group_id -> Group for secret groups
+        self.open = {}         # group_id -> Group with at least one free seat
+        self.subjects = []     # sorted (subject.casefold(), group_id), for prefix search
+        self.user_groups = {}  # user_id -> group_id (one group per user per guild)
+        self.next_id = 1
+
+
+class GroupRegistry:
+    """All study groups, partitioned by guild, with indexes maintained on every change."""
+    def __init__(self):
+        self._guilds = {}
+
+    def _index(self, guild_id: int) -> _GuildIndex:
+        index = self._guilds.get(guild_id)
+        if index is None:
+            index = self._guilds[guild_id] = _GuildIndex()
+        return index
+
+    # ----- Lookups -----
+    def get(self, guild_id: int, group_id: int):
+        index = self._guilds.get(guild_id)
+        return index.groups.get(group_id) if index else None
+
+    def groups(self, guild_id: int) -> list:
+        index = self._guilds.get(guild_id)
+        return list(index.groups.values()) if index else []
+
+    def public_groups(self, guild_id: int) -> list:
+        index = self._guilds.get(guild_id)
+        return list(index.public.values()) if index else []
+
+    def secret_groups(self, guild_id: int) -> list:
+        index = self._guilds.get(guild_id)
+        return list(index.secret.values()) if index else []
+
+    def open_groups(self, guild_id: int) -> list:
+        """Groups that still have a free seat, by ID."""
+        index = self._guilds.get(guild_id)
+        return sorted(index.open.values(), key=lambda group: group.group_id) if index else []
+
+    def search(self, guild_id: int, prefix: str, limit: int = 25) -> list:
+        """Groups whose subject starts with prefix (case-insensitive), alphabetically."""
+        index = self._guilds.get(guild_id)
+        if not index:
+            return []
+        prefix = prefix.casefold()
+        results = []
+        for subject, group_id in index.subjects[bisect.bisect_left(index.subjects, (prefix,)):]:
+            if not subject.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(index.groups[group_id])
+        return results
+
+    def group_of(self, guild_id: int, user_id: int):
+        """The group a user is in within a guild, or None."""
+        index = self._guilds.get(guild_id)
+        if not index:
+            return None
+        group_id = index.user_groups.get(user_id)
+        return index.groups.get(group_id) if group_id is not None else None
+
+    def count(self, guild_id: int = None) -> int:
+        if guild_id is not None:
+            index = self._guilds.get(guild_id)
+            return len(index.groups) if index else 0
+        return sum(len(index.groups) for index in self._guilds.values())
+
+    def stats(self) -> dict:
+        """Totals across guilds, read straight from the index sizes."""
+        totals = {"guilds": 0, "groups": 0, "public": 0, "secret": 0, "open": 0, "members": 0}
+        for index in list(self._guilds.values()):
+            totals["guilds"] += 1
+            totals["groups"] += len(index.groups)
+            totals["public"] += len(index.public)
+            totals["secret"] += len(index.secret)
+            totals["open"] += len(index.open)
+            totals["members"] += len(index.user_groups)
+        return totals
+
+    def guild_ids(self) -> list:
+        return list(self._guilds)
+
+    def all_groups(self):
+        for index in self._guilds.values():
+            yield from index.groups.values()
+
+    # ----- Mutations -----
+    def next_group_id(self, guild_id: int) -> int:
+        """Hands out the next group ID in a guild."""
+        index = self._index(guild_id)
+        group_id = index.next_id
+        index.next_id += 1
+        return group_id
+
+    def next_id_of(self, guild_id: int) -> int:
+        return self._index(guild_id).next_id
+
+    def set_next_id(self, guild_id: int, next_id: int):
+        index = self._index(guild_id)
+        index.next_id = max(index.next_id, next_id)
+
+    def add(self, group: Group):
+        index = self._index(group.guild_id)
+        index.groups[group.group_id] = group
+        (index.secret if group.secret else index.public)[group.group_id] = group
+        if not group.is_full:
+            index.open[group.group_id] = group
+        bisect.insort(index.subjects, (group.subject.casefold(), group.group_id))
+        for user_id in group.members:
+            index.user_groups[user_id] = group.group_id
+        index.next_id = max(index.next_id, group.group_id + 1)
+
+    def remove(self, group: Group):
+        """Drop a group and free its members."""
+        index = self._guilds.get(group.guild_id)
+        if not index or index.groups.pop(group.group_id, None) is None:
+            return
+        index.public.pop(group.group_id, None)
+        index.secret.pop(group.group_id, None)
+        index.open.pop(group.group_id, None)
+        position = bisect.bisect_left(index.subjects, (group.subject.casefold(), group.group_id))
+        if position < len(index.subjects) and index.subjects[position][1] == group.group_id:
+            del index.subjects[position]
+        for user_id in group.members:
+            if index.user_groups.get(user_id) == group.group_id:
+                del index.user_groups[user_id]
+
+    def add_member(self, group: Group, user_id: int):
+        index = self._index(group.guild_id)
+        group.members.add(user_id)
+        index.user_groups[user_id] = group.group_id
+        if group.is_full:
+            index.open.pop(group.group_id, None)
+
+    def remove_member(self, group: Group, user_id: int):
+        index = self._index(group.guild_id)
+        group.members.discard(user_id)
+        if index.user_groups.get(user_id) == group.group_id:
+            del index.user_groups[user_id]
+        if not group.is_full and group.group_id in index.groups:
+            index.open[group.group_id] = group
+
+    def drop_guild(self, guild_id: int):
+        """Forget every group of a guild (in memory only)."""
+        self._guilds.pop(guild_id, None)
@@ -0,0 +1,310 @@
+import os
+import re
+import json
+import shutil
+import asyncio
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from ai_client import ai_client
+from pdf_extraction import run_in_pool
+from text_processing import split_into_chunks
+
+# Per-document retrieval for -ask: the text is chunked once, indexed into NumPy arrays, and each
+# question only sends the top-k chunks to the model. BM25 needs no network; embedding backends plug
+# in through EMBEDDERS. Indexes live in an LRU; with RETRIEVAL_INDEX_DIR set they are also written to
+# disk and served memory-mapped, so evicted or restarted indexes come back without being rebuilt.
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "bm25")  # bm25, or a key of EMBEDDERS
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "300"))
+RETRIEVAL_CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "50"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "32"))  # indexes kept loaded
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR")  # Unset keeps indexes in memory only.
+RETRIEVAL_INDEX_MAX_BYTES = int(os.getenv("RETRIEVAL_INDEX_MAX_BYTES", str(1024 * 1024 * 1024)))  # 0 = no limit
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH = 64  # chunks per embeddings request
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+TERM = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at be by for from has in is it its of on or that the this to was were "
+                      "what when where which who why how with does do did can".split())
+
+
+def terms(text: str) -> list:
+    return [term for term in TERM.findall(text.lower()) if term not in STOPWORDS]
+
+
+class Bm25Index:
+    """BM25 over chunks, stored as term postings: the chunks of term t are chunk_ids[offsets[t]:offsets[t + 1]]."""
+    kind = "bm25"
+
+    def __init__(self, chunks: list, vocabulary: dict, offsets: np.ndarray, chunk_ids: np.ndarray,
+                 weights: np.ndarray):
+        self.chunks = chunks
+        self.vocabulary = vocabulary  # term -> term id
+        self.offsets = offsets
+        self.chunk_ids = chunk_ids
+        self.weights = weights        # BM25 weight of each (term, chunk) posting
+
+    @classmethod
+    def build(cls, chunks: list) -> "Bm25Index":
+        """Index chunks (CPU-bound; run it in a worker)."""
+        postings = {}
+        lengths = np.empty(len(chunks), dtype=np.float32)
+        for chunk_id, chunk in enumerate(chunks):
+            chunk_terms = terms(chunk)
+            lengths[chunk_id] = len(chunk_terms)
+            for term, count in Counter(chunk_terms).items():
+                postings.setdefault(term, []).append((chunk_id, count))
+
+        vocabulary, offsets, chunk_ids, counts = {}, [0], [], []
+        for term, term_postings in postings.items():
+            vocabulary[term] = len(vocabulary)
+            chunk_ids.extend(chunk_id for chunk_id, _ in term_postings)
+            counts.extend(count for _, count in term_postings)
+            offsets.append(len(chunk_ids))
+        offsets = np.array(offsets, dtype=np.int64)
+        chunk_ids = np.array(chunk_ids, dtype=np.int32)
+        counts = np.array(counts, dtype=np.float32)
+
+        document_frequency = np.diff(offsets).astype(np.float32)
+        idf = np.log1p((len(chunks) - document_frequency + 0.5) / (document_frequency + 0.5))
+        length_ratio = lengths[chunk_ids] / max(float(lengths.mean()), 1.0) if len(chunks) else lengths
+        weights = (np.repeat(idf, np.diff(offsets)) * counts * (BM25_K1 + 1)
+                   / (counts + BM25_K1 * (1 - BM25_B + BM25_B * length_ratio))).astype(np.float32)
+        return cls(chunks, vocabulary, offsets, chunk_ids, weights)
+
+    async def scores(self, question: str) -> np.ndarray:
+        term_ids = sorted({self.vocabulary[term] for term in terms(question) if term in self.vocabulary})
+        if not term_ids:
+            return np.zeros(len(self.chunks), dtype=np.float32)
+        spans = [slice(self.offsets[term_id], self.offsets[term_id + 1]) for term_id in term_ids]
+        chunk_ids = np.concatenate([self.chunk_ids[span] for span in spans])
+        weights = np.concatenate([self.weights[span] for span in spans])
+        return np.bincount(chunk_ids, weights=weights, minlength=len(self.chunks))
+
+    def arrays(self) -> dict:
+        return {"offsets": self.offsets, "chunk_ids": self.chunk_ids, "weights": self.weights}
+
+    def metadata(self) -> dict:
+        return {"vocabulary": self.vocabulary}
+
+    @classmethod
+    def from_saved(cls, chunks: list, arrays: dict, metadata: dict) -> "Bm25Index":
+        return cls(chunks, metadata["vocabulary"], arrays["offsets"], arrays["chunk_ids"], arrays["weights"])
+
+
+class Embedder(ABC):
+    """An embedding model: maps texts to vectors. Subclass and add to EMBEDDERS to plug one in."""
+    name = ""
+
+    @abstractmethod
+    async def embed(self, texts: list) -> np.ndarray:
+        """One row per text."""
+
+
+class ApiEmbedder(Embedder):
+    """Embeddings from the completion API's /embeddings endpoint."""
+    name = "api"
+
+    def __init__(self, model: str = EMBEDDING_MODEL):
+        self.model = model
+
+    async def embed(self, texts: list) -> np.ndarray:
+        batches = [texts[start:start + EMBEDDING_BATCH] for start in range(0, len(texts), EMBEDDING_BATCH)]
+        vectors = await asyncio.gather(*(ai_client.embed(batch, model=self.model) for batch in batches))
+        return np.array([vector for batch in vectors for vector in batch], dtype=np.float32)
+
+
+EMBEDDERS = {"api": ApiEmbedder}
+
+
+class DenseIndex:
+    """Unit-length chunk embeddings in one matrix; a question is scored against all of them with one product."""
+    def __init__(self, chunks: list, vectors: np.ndarray, embedder: Embedder):
+        self.chunks = chunks
+        self.vectors = vectors
+        self.embedder = embedder
+        self.kind = embedder.name
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @classmethod
+    async def build(cls, chunks: list, embedder: Embedder) -> "DenseIndex":
+        return cls(chunks, cls.normalize(await embedder.embed(chunks)), embedder)
+
+    async def scores(self, question: str) -> np.ndarray:
+        query = self.normalize(await self.embedder.embed([question]))[0]
+        return self.vectors @ query
+
+    def arrays(self) -> dict:
+        return {"vectors": self.vectors}
+
+    def metadata(self) -> dict:
+        return {}
+
+    @classmethod
+    def from_saved(cls, chunks: list, arrays: dict, metadata: dict, embedder: Embedder) -> "DenseIndex":
+        return cls(chunks, arrays["vectors"], embedder)
+
+
+async def top_chunks(index, question: str, k: int = RETRIEVAL_TOP_K) -> list:
+    """The k best chunks for a question as (score, chunk), best first; chunks that share no terms are left out."""
+    scores = await index.scores(question)
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(float(scores[i]), index.chunks[i]) for i in ranked if scores[i] > 0]
+
+
+def _build_bm25(text: str) -> Bm25Index:
+    return Bm25Index.build(split_into_chunks(text, RETRIEVAL_CHUNK_TOKENS, RETRIEVAL_CHUNK_OVERLAP))
+
+
+class IndexCache:
+    """LRU of loaded indexes by document key, building each at most once even under concurrent questions."""
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_SIZE, index_dir: str = RETRIEVAL_INDEX_DIR,
+                 backend: str = RETRIEVAL_BACKEND, max_disk_bytes: int = RETRIEVAL_INDEX_MAX_BYTES):
+        self.max_entries = max_entries
+        self.index_dir = index_dir
+        self.backend = backend
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_bytes = None         # size of index_dir, measured on the first save
+        self._entries = OrderedDict()  # key -> index, least recently used first
+        self._building = {}            # key -> task building the index
+        self._embedder = None
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+
+    def embedder(self) -> Embedder:
+        if self._embedder is None and self.backend != "bm25":
+            self._embedder = EMBEDDERS[self.backend]()
+        return self._embedder
+
+    async def get(self, key: str, load_text):
+        """Return the index for key, loading it from disk or building it from `await load_text()`.
+
+        load_text returns the document's text, or None if it is gone (then so is the index: returns None).
+        """
+        index = self._entries.get(key)
+        if index is not None:
+            self._entries.move_to_end(key)
+            return index
+        task = self._building.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_or_build(key, load_text))
+            self._building[key] = task
+            task.add_done_callback(lambda done: self._building.pop(key, None))
+        index = await asyncio.shield(task)
+        if index is not None:
+            self._entries[key] = index
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # its arrays stay on disk and are mapped back in on demand
+        return index
+
+    async def _load_or_build(self, key: str, load_text):
+        if self.index_dir:
+            index = await asyncio.to_thread(self._load, key)
+            if index is not None:
+                return index
+        text = await load_text()
+        if text is None:
+            return None
+        if self.backend == "bm25":
+            index = await run_in_pool(_build_bm25, text)
+        else:
+            chunks = split_into_chunks(text, RETRIEVAL_CHUNK_TOKENS, RETRIEVAL_CHUNK_OVERLAP)
+            index = await DenseIndex.build(chunks, self.embedder())
+        if not self.index_dir:
+            return index
+        await asyncio.to_thread(self._save, key, index)
+        # Serve it memory-mapped from now on, so the page cache rather than the heap holds the arrays.
+        return await asyncio.to_thread(self._load, key) or index
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.index_dir, f"{key}.{self.backend}")
+
+    def _save(self, key: str, index):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(tmp_path, exist_ok=True)
+            for name, array in index.arrays().items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+            with open(os.path.join(tmp_path, "index.json"), "w", encoding="utf-8") as f:
+                json.dump({"chunks": index.chunks, **index.metadata()}, f)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Retrieval index: could not write {path}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        if not self.max_disk_bytes:
+            return
+        if self.disk_bytes is None:
+            self._trim_disk()
+        else:
+            self.disk_bytes += _directory_size(path)
+            if self.disk_bytes > self.max_disk_bytes:
+                self._trim_disk()
+
+    def _trim_disk(self):
+        """Delete the least recently used indexes until index_dir is under 90% of max_disk_bytes, like the PDF cache."""
+        indexes = []
+        with os.scandir(self.index_dir) as entries:
+            for entry in entries:
+                if entry.is_dir() and not entry.name.endswith(".tmp"):
+                    try:
+                        indexes.append((entry.stat().st_mtime, _directory_size(entry.path), entry.path))
+                    except OSError:
+                        continue
+        total = sum(size for _, size, _ in indexes)
+        target = self.max_disk_bytes * 0.9 if total > self.max_disk_bytes else self.max_disk_bytes
+        evicted = 0
+        for _, size, path in sorted(indexes):
+            if total <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)  # an index still mapped in memory keeps working until dropped
+            total -= size
+            evicted += 1
+        self.disk_bytes = total
+        if evicted:
+            print(f"Retrieval index: evicted {evicted} indexes from disk, {total // (1024 * 1024)} MB left")
+
+    def _load(self, key: str):
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+                metadata = json.load(f)
+            arrays = {name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+                      for name in os.listdir(path) if name.endswith(".npy")}
+            os.utime(path)  # eviction goes by mtime, so a load keeps the index
+        except (OSError, ValueError):
+            return None
+        chunks = metadata.pop("chunks")
+        if self.backend == "bm25":
+            return Bm25Index.from_saved(chunks, arrays, metadata)
+        return DenseIndex.from_saved(chunks, arrays, metadata, self.embedder())
+
+
+def _directory_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+index_cache = IndexCache()
+
+
+def build_prompt(question: str, hits: list) -> str:
+    excerpts = "\n\n".join(f"[{number}] {chunk.strip()}" for number, (_, chunk) in enumerate(hits, 1))
+    return ("Answer the question using only these excerpts from a document. "
+            "If they don't contain the answer, say so.\n\n"
+            f"{excerpts}\n\nQuestion: {question}\nAnswer:")
+
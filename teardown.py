@@ -0,0 +1,128 @@
+import os
+import time
+import asyncio
+
+import discord
+
+# Expired groups are torn down in batches: every group in a batch runs concurrently, but requests for the
+# same channel go one at a time. Rate limits (429) and server errors are retried by discord.py itself; a
+# channel delete that still fails is tried again later, since its group is already gone from the store.
+TEARDOWN_CONCURRENCY = int(os.getenv("TEARDOWN_CONCURRENCY", "8"))  # requests in flight across all channels
+TEARDOWN_BATCH_WINDOW = float(os.getenv("TEARDOWN_BATCH_WINDOW", "0.25"))  # seconds expiries are gathered
+TEARDOWN_RETRIES = int(os.getenv("TEARDOWN_RETRIES", "5"))  # later attempts at a failed channel delete
+TEARDOWN_RETRY_DELAY = float(os.getenv("TEARDOWN_RETRY_DELAY", "30"))  # seconds before the first, doubled each time
+
+
+class TeardownStep:
+    """One Discord request: a key for the route and channel it hits, and a function that performs it."""
+    __slots__ = ("bucket", "call", "retry", "attempts")
+
+    def __init__(self, bucket, call, retry: bool = False):
+        self.bucket = bucket  # e.g. ("DELETE /channels", channel_id); requests with the same key run one at a time
+        self.call = call      # zero-argument coroutine function
+        self.retry = retry    # try again later if it fails
+        self.attempts = 0
+
+
+def send_step(channel, content: str) -> TeardownStep:
+    return TeardownStep(("POST /channels/messages", channel.id), lambda: channel.send(content))
+
+
+def delete_step(channel) -> TeardownStep:
+    return TeardownStep(("DELETE /channels", channel.id), lambda: channel.delete(), retry=True)
+
+
+class TeardownPipeline:
+    """Bounded, batching executor for group teardown requests that retries failed channel deletes."""
+    def __init__(self, concurrency: int = TEARDOWN_CONCURRENCY, batch_window: float = TEARDOWN_BATCH_WINDOW,
+                 retries: int = TEARDOWN_RETRIES, retry_delay: float = TEARDOWN_RETRY_DELAY):
+        self.batch_window = batch_window
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._slots = asyncio.Semaphore(concurrency)
+        self._bucket_locks = {}
+        self._pending = []        # chains waiting for the current batch window to close
+        self._batch_task = None
+        self._tasks = set()
+        self._retries = set()     # tasks waiting to resubmit a failed delete
+        self.last_batch = None    # timing report of the most recent batch
+
+    @property
+    def pending(self) -> int:
+        """Chains waiting for the current batch window to close."""
+        return len(self._pending)
+
+    def submit(self, chains: list):
+        """Queue one group's teardown: each chain runs in order, chains run side by side."""
+        self._pending.extend(chains)
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = asyncio.create_task(self._collect())
+
+    async def _collect(self):
+        while self._pending:
+            await asyncio.sleep(self.batch_window)
+            chains, self._pending = self._pending, []
+            # Run the batch in the background so the next window can start collecting straight away.
+            task = asyncio.create_task(self.run_batch(chains))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def run_batch(self, chains: list) -> dict:
+        """Run a batch of chains concurrently and report how it went."""
+        started = time.perf_counter()
+        stats = {"chains": len(chains), "requests": 0, "failures": 0}
+        await asyncio.gather(*(self._run_chain(chain, stats) for chain in chains))
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        self.last_batch = stats
+        print(f"Teardown batch: {stats['chains']} chains, {stats['requests']} requests, "
+              f"{stats['failures']} failures in {stats['seconds']}s")
+        if len(self._tasks) <= 1:  # no other batch is holding on to a bucket lock
+            self._bucket_locks = {bucket: lock for bucket, lock in self._bucket_locks.items() if lock.locked()}
+        return stats
+
+    @property
+    def retrying(self) -> int:
+        """Failed deletes waiting for their next attempt."""
+        return len(self._retries)
+
+    async def _run_chain(self, chain: list, stats: dict):
+        # Every step runs even if an earlier one failed: a missing goodbye message must not leave the channel.
+        for step in chain:
+            try:
+                done = await self._run_step(step, stats)
+            except Exception as e:  # one bad request must not take the rest of the batch with it
+                print(f"Teardown request {step.bucket} failed: {e!r}")
+                done = False
+            if not done:
+                stats["failures"] += 1
+                if step.retry:
+                    self._retry_later(step)
+
+    def _retry_later(self, step: TeardownStep):
+        step.attempts += 1
+        if step.attempts > self.retries:
+            print(f"Teardown request {step.bucket} gave up after {step.attempts} attempts")
+            return
+        task = asyncio.create_task(self._retry(step, self.retry_delay * 2 ** (step.attempts - 1)))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _retry(self, step: TeardownStep, delay: float):
+        await asyncio.sleep(delay)
+        self.submit([[step]])
+
+    async def _run_step(self, step: TeardownStep, stats: dict) -> bool:
+        lock = self._bucket_locks.setdefault(step.bucket, asyncio.Lock())
+        async with lock, self._slots:
+            stats["requests"] += 1
+            try:
+                await step.call()
+                return True
+            except discord.NotFound:
+                return True  # already gone
+            except discord.HTTPException as e:
+                print(f"Teardown request {step.bucket} failed: {e}")
+                return False
+
+
+teardown_pipeline = TeardownPipeline()
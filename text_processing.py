@@ -0,0 +1,163 @@
+import re
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate.
+    tiktoken = None
+
+TOKENIZER_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4  # Rough English average, used when tiktoken isn't installed.
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count (or, without tiktoken, estimate) the tokens in a piece of text."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_into_chunks(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> list:
+    """Split text into chunks of at most chunk_tokens tokens, each overlapping the previous one."""
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        step = chunk_tokens - overlap_tokens
+        return [encoding.decode(tokens[start:start + chunk_tokens])
+                for start in range(0, max(len(tokens) - overlap_tokens, 1), step)]
+
+    chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            # Prefer to cut at whitespace so words aren't split across chunks.
+            cut = text.rfind(" ", start + chunk_chars // 2, end)
+            if cut != -1:
+                end = cut
+        chunks.append(text[start:end])
+        if end == len(text):
+            break
+        start = max(end - overlap_chars, start + 1)
+    return chunks
+
+
+# Compaction of extracted PDF text before it goes into prompts. Pages arrive separated by "\f".
+PAGE_BREAK = "\f"
+EDGE_LINES = 3  # lines at the top and bottom of a page checked for running headers and footers
+PAGE_NUMBER = re.compile(r"^\W*(page\s*)?\d+(\s*(of|/)\s*\d+)?\W*$", re.IGNORECASE)
+DIGITS = re.compile(r"\d+")
+SPACES = re.compile(r"[ \t\u00a0]+")
+BULLET = re.compile(r"^([-*•▪●]|\d+[.)]|[a-z][.)])\s")
+HEADING_CHARS = 40  # a shorter line followed by a capitalised one is taken as a heading, not a broken sentence
+
+
+class CompactionStats:
+    """Token counts before and after compact_text."""
+    __slots__ = ("tokens_before", "tokens_after", "boilerplate_lines", "trimmed")
+
+    def __init__(self, tokens_before: int, tokens_after: int, boilerplate_lines: int, trimmed: bool):
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.boilerplate_lines = boilerplate_lines
+        self.trimmed = trimmed
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def __str__(self):
+        percent = 100 * self.tokens_saved / self.tokens_before if self.tokens_before else 0
+        trimmed = ", trimmed to budget" if self.trimmed else ""
+        return (f"{self.tokens_before} -> {self.tokens_after} tokens ({self.tokens_saved} saved, {percent:.0f}%; "
+                f"{self.boilerplate_lines} header/footer lines{trimmed})")
+
+
+def _line_signature(line: str) -> str:
+    # Page numbers and dates differ from page to page; the rest of a running header doesn't.
+    return DIGITS.sub("#", SPACES.sub(" ", line.strip().lower()))
+
+
+def strip_boilerplate(pages: list) -> tuple:
+    """Drop page numbers and header/footer lines that repeat on most pages; returns (pages as line lists, lines dropped)."""
+    pages = [[line for line in page.splitlines() if line.strip()] for page in pages]
+    edges = [page[:EDGE_LINES] + page[-EDGE_LINES:] for page in pages]
+    seen_on = {}
+    for edge in edges:
+        for signature in {_line_signature(line) for line in edge}:
+            seen_on[signature] = seen_on.get(signature, 0) + 1
+    # A line counts as a running header/footer when it is on at least half the pages (and 3 or more).
+    threshold = max(3, (len(pages) + 1) // 2)
+    repeated = {signature for signature, count in seen_on.items() if count >= threshold}
+
+    dropped = 0
+    cleaned = []
+    for page in pages:
+        keep = []
+        for index, line in enumerate(page):
+            at_edge = index < EDGE_LINES or index >= len(page) - EDGE_LINES
+            if at_edge and (PAGE_NUMBER.match(line.strip()) or _line_signature(line) in repeated):
+                dropped += 1
+                continue
+            keep.append(line)
+        cleaned.append(keep)
+    return cleaned, dropped
+
+
+def join_lines(lines: list) -> str:
+    """Rejoin lines the PDF broke mid-sentence (undoing hyphenation) and collapse whitespace."""
+    paragraphs = []
+    current = previous = ""
+    for line in lines:
+        line = SPACES.sub(" ", line).strip()
+        if not current:
+            current = line
+        elif BULLET.match(line):
+            paragraphs.append(current)
+            current = line
+        elif current.endswith("-") and current[-2:-1].isalpha() and line[:1].islower():
+            current = current[:-1] + line  # "informa-" + "tion"
+        elif line[:1].islower() or not (current.endswith((".", "!", "?", ":", ";")) or len(previous) < HEADING_CHARS):
+            current = f"{current} {line}"
+        else:
+            paragraphs.append(current)
+            current = line
+        previous = line
+    if current:
+        paragraphs.append(current)
+    return "\n".join(paragraphs)
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens (exact with tiktoken, estimated without)."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[: max_tokens * CHARS_PER_TOKEN]
+
+
+def compact_text(text: str, max_tokens: int = 0) -> tuple:
+    """Normalize extracted PDF text for prompting and fit it to max_tokens (0 = no limit); returns (text, stats)."""
+    tokens_before = count_tokens(text)
+    pages, dropped = strip_boilerplate(text.split(PAGE_BREAK))
+    compacted = "\n\n".join(page_text for page_text in (join_lines(lines) for lines in pages) if page_text)
+    tokens_after = count_tokens(compacted)
+    trimmed = bool(max_tokens) and tokens_after > max_tokens
+    if trimmed:
+        compacted = trim_to_tokens(compacted, max_tokens)
+        tokens_after = count_tokens(compacted)
+    return compacted, CompactionStats(tokens_before, tokens_after, dropped, trimmed)